@@ -43,6 +43,10 @@ class TravelOfferAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         })
     )
+    
+    def save_model(self, request, obj, form, change):
+        # Counters move through F() updates while the form is open; don't write them back
+        obj.save(update_fields=TravelOffer.content_fields() if change else None)
 
 
 @admin.register(Booking)
@@ -0,0 +1,154 @@
+"""
+Typeahead suggestions for the offer search box.
+
+Suggestions come from an in-memory prefix index over the destinations and
+title words of approved offers, weighted by how often those offers are
+booked. The index is a sorted key array searched with ``bisect``; answers for
+one- and two-letter prefixes (the widest ranges) are precomputed when the
+index is built, so lookups never touch the database.
+
+The index is rebuilt lazily when the shared catalogue version changes (offers
+approved, edited or expired) or after ``AUTOCOMPLETE_MAX_AGE`` seconds, which
+also picks up new booking counts.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+from .catalogue import get_catalogue_version
+from .models import TravelOffer
+from .search import STOP_WORDS
+
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+DESTINATION = 'destination'
+TITLE = 'title'
+
+# Prefixes up to this length have their best suggestions precomputed
+PRECOMPUTED_PREFIX_LENGTH = 2
+MAX_SUGGESTIONS = 10
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall((text or '').lower()))
+
+
+class PrefixIndex:
+    """Immutable sorted-array prefix index of weighted suggestions"""
+
+    def __init__(self, suggestions):
+        # suggestions: {(kind, label): weight}
+        self.suggestions = [
+            {'label': label, 'kind': kind, 'weight': weight}
+            for (kind, label), weight in suggestions.items()
+        ]
+
+        # Every word position of a label is a key, so "coast" finds "Gold Coast, QLD"
+        entries = []
+        for position, suggestion in enumerate(self.suggestions):
+            words = normalize(suggestion['label']).split()
+            for start in range(len(words)):
+                entries.append((' '.join(words[start:]), position))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+        prefixed = defaultdict(set)
+        for key, position in entries:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                prefixed[key[:length]].add(position)
+        self.precomputed = {
+            prefix: self._rank(positions, MAX_SUGGESTIONS)
+            for prefix, positions in prefixed.items()
+        }
+
+    def _rank(self, positions, limit):
+        ranked = sorted(
+            positions,
+            key=lambda p: (
+                -self.suggestions[p]['weight'],
+                self.suggestions[p]['kind'] != DESTINATION,
+                self.suggestions[p]['label'],
+            ),
+        )
+        return [self.suggestions[p] for p in ranked[:limit]]
+
+    def lookup(self, prefix, limit=MAX_SUGGESTIONS):
+        """Best suggestions whose label has a word starting with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.precomputed.get(prefix, [])[:limit]
+
+        start = bisect_left(self.keys, prefix)
+        stop = bisect_left(self.keys, prefix + '\uffff', lo=start)
+        return self._rank(set(self.positions[start:stop]), limit)
+
+
+def load_suggestions():
+    """Weighted destination and title-word suggestions for approved offers"""
+    offers = (
+        TravelOffer.objects.filter(status='approved')
+        .order_by()
+        .annotate(booking_count=Count('bookings'))
+        .values_list('destination', 'title', 'booking_count')
+    )
+    suggestions = defaultdict(int)
+    for destination, title, booking_count in offers.iterator():
+        # Every offer counts once, so unbooked destinations are still suggested
+        weight = booking_count + 1
+        if destination:
+            suggestions[(DESTINATION, destination.strip())] += weight
+        for word in set(WORD_RE.findall(title or '')):
+            if len(word) >= 3 and not word.isdigit() and word.lower() not in STOP_WORDS:
+                suggestions[(TITLE, word.lower())] += weight
+    return suggestions
+
+
+class DestinationAutocomplete:
+    """Self-refreshing holder for the current PrefixIndex"""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 600)
+        self._lock = threading.RLock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+
+    def _is_fresh(self):
+        return (
+            self._index is not None
+            and self._version == get_catalogue_version()
+            and time.monotonic() - self._built_at < self.max_age
+        )
+
+    def rebuild(self):
+        """Rebuild the prefix index from the database"""
+        with self._lock:
+            version = get_catalogue_version()
+            self._index = PrefixIndex(load_suggestions())
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._index
+
+    def index(self):
+        """Current index, rebuilt first if stale; threads queued on the lock reuse the rebuild"""
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self.rebuild()
+        return self._index
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        return self.index().lookup(prefix, limit)
+
+
+destination_autocomplete = DestinationAutocomplete()
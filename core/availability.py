@@ -0,0 +1,173 @@
+"""
+Username and email availability answered from a Bloom filter.
+
+Every taken username and email (lowercased) is added to an in-memory Bloom
+filter. A value the filter has never seen is certainly free, so most
+check-as-you-type lookups on the register form answer "available" without a
+query; only probable hits are confirmed against the ``LOWER(username)`` and
+``LOWER(email)`` indexes.
+
+New users are added to this process's filter as they are saved and bump a
+shared version, so other workers fetch just the users created since they
+last looked. Email changes are picked up by the full rebuild every
+``AVAILABILITY_FILTER_MAX_AGE`` seconds. Registration itself always checks
+the database, so a stale filter can only make the hint optimistic.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .repositories import UserRepository
+
+
+USERS_VERSION_KEY = 'users:version'
+
+USERNAME = 'username'
+EMAIL = 'email'
+
+
+def get_users_version():
+    version = cache.get(USERS_VERSION_KEY)
+    if version is None:
+        cache.add(USERS_VERSION_KEY, 1, None)
+        version = cache.get(USERS_VERSION_KEY, 1)
+    return version
+
+
+def bump_users_version():
+    try:
+        return cache.incr(USERS_VERSION_KEY)
+    except ValueError:
+        cache.add(USERS_VERSION_KEY, 1, None)
+        return cache.incr(USERS_VERSION_KEY)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings using double hashing over one BLAKE2b digest"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _key(kind, value):
+    return f'{kind}:{value.strip().lower()}'
+
+
+class TakenNamesFilter:
+    """Process-local Bloom filter of taken usernames and emails"""
+
+    # Room for growth before the filter is rebuilt larger
+    HEADROOM = 2
+
+    def __init__(self, max_age=None, error_rate=None):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'AVAILABILITY_FILTER_MAX_AGE', 3600)
+        self.error_rate = error_rate or getattr(settings, 'AVAILABILITY_FILTER_ERROR_RATE', 0.01)
+        self._lock = threading.Lock()
+        self._filter = None
+        self._built_at = 0.0
+        self._version = None
+        self._max_id = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.checks = 0
+        self.filtered = 0
+        self.confirmed = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+
+    @staticmethod
+    def _add_rows(bloom, rows):
+        """Add the rows' names to the filter and return the highest user id among them"""
+        max_id = 0
+        for user_id, username, email in rows:
+            bloom.add(_key(USERNAME, username))
+            if email:
+                bloom.add(_key(EMAIL, email))
+            max_id = max(max_id, user_id)
+        return max_id
+
+    def rebuild(self):
+        version = get_users_version()
+        rows = list(UserRepository.get_taken_names())
+        bloom = BloomFilter(max(1024, 2 * len(rows) * self.HEADROOM), self.error_rate)
+        self._max_id = self._add_rows(bloom, rows)
+        self._filter, self._version, self._built_at = bloom, version, time.monotonic()
+        self.rebuilds += 1
+        return bloom
+
+    def _current(self):
+        with self._lock:
+            if self._filter is None or time.monotonic() - self._built_at > self.max_age:
+                return self.rebuild()
+            version = get_users_version()
+            if version != self._version:
+                rows = UserRepository.get_taken_names(after_id=self._max_id)
+                self._max_id = max(self._max_id, self._add_rows(self._filter, rows))
+                self._version = version
+                if self._filter.count > self._filter.capacity:
+                    return self.rebuild()
+            return self._filter
+
+    def add_user(self, user):
+        """Record a saved user here and tell other workers to catch up"""
+        with self._lock:
+            # Only database syncs move _max_id: a user with a lower id committed
+            # later by another worker must still be fetched on the next sync
+            if self._filter is not None:
+                self._add_rows(self._filter, [(user.pk, user.username, user.email)])
+        bump_users_version()
+
+    def is_taken(self, kind, value):
+        """Whether a username or email is taken; the database is asked only on a filter hit"""
+        bloom = self._current()
+        hit = _key(kind, value) in bloom
+        with self._lock:
+            self.checks += 1
+            if hit:
+                self.confirmed += 1
+            else:
+                self.filtered += 1
+        if not hit:
+            return False
+        taken = UserRepository.username_taken(value) if kind == USERNAME else UserRepository.email_taken(value)
+        if not taken:
+            with self._lock:
+                self.false_positives += 1
+        return taken
+
+    def stats(self):
+        return {
+            'entries': self._filter.count if self._filter else 0,
+            'bits': self._filter.size if self._filter else 0,
+            'checks': self.checks,
+            'answered_by_filter': self.filtered,
+            'database_checks': self.confirmed,
+            'false_positives': self.false_positives,
+            'rebuilds': self.rebuilds,
+        }
+
+
+taken_names = TakenNamesFilter()
@@ -0,0 +1,23 @@
+"""
+Authentication backend that loads each request's user with its profile.
+
+``AuthenticationMiddleware`` fetches the logged-in user once per request
+through the backend's ``get_user``. Joining ``userprofile`` into that query
+means ``request.user.userprofile`` is already populated, so every role check
+during the request (templates, decorators, services) is a plain attribute
+read instead of a profile query.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend whose session users come with their UserProfile"""
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('userprofile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
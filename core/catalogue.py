@@ -0,0 +1,345 @@
+"""
+Process-local columnar snapshot of travel offers.
+
+The offers list filters (category, price range, date range) are answered from
+NumPy arrays instead of a fresh ORM query chain: each filter is a vectorised
+boolean mask and the matching ids come back already in listing order
+(newest first). Only the page being rendered is then loaded from the database
+with a single ``id__in`` query, via ``OfferIdSequence``.
+
+Offer saves and deletes patch the local snapshot in place where they can and
+bump a catalogue version shared through the Django cache. Other processes
+notice the new version on their next read and rebuild; ``OFFER_CATALOGUE_MAX_AGE``
+bounds staleness when the cache backend is not shared between workers.
+
+Ratings and spot counts are not part of any catalogue structure, only of
+serialised offers. Changes to them bump a separate offer payload version, so
+reviews and bookings leave the snapshot and the indexes built on it alone.
+"""
+import threading
+import time
+from datetime import date, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .facets import facets_from_columns
+from .intervals import IntervalIndex
+from .models import Category, TravelOffer
+
+
+CATALOGUE_VERSION_KEY = 'offers:catalogue-version'
+OFFER_PAYLOAD_VERSION_KEY = 'offers:payload-version'
+
+STATUS_CODES = {
+    code: index for index, (code, _label) in enumerate(TravelOffer.STATUS_CHOICES)
+}
+APPROVED = STATUS_CODES['approved']
+DELETED = -1
+
+# How the start_date/end_date filters match an offer's trip dates
+WITHIN = 'within'
+OVERLAP = 'overlap'
+
+LISTING_RELATED = ('advertiser', 'category')
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+        return cache.incr(key)
+
+
+def get_catalogue_version():
+    """Current catalogue version shared by all workers using the cache"""
+    return _get_version(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version():
+    """Mark every catalogue-derived structure as stale and return the new version"""
+    return _bump_version(CATALOGUE_VERSION_KEY)
+
+
+def get_offer_payload_version():
+    """Version of the ratings and spot counts carried by serialised offers"""
+    return _get_version(OFFER_PAYLOAD_VERSION_KEY)
+
+
+def bump_offer_payload_version():
+    """Mark serialised offers stale after a rating or spot count change; returns the new version"""
+    return _bump_version(OFFER_PAYLOAD_VERSION_KEY)
+
+
+def _to_micros(value):
+    return int(value.astimezone(dt_timezone.utc).timestamp() * 1_000_000)
+
+
+def _to_cents(value):
+    return int(round(value * 100))
+
+
+class OfferColumns:
+    """One immutable-length set of column arrays, sorted newest first"""
+
+    def __init__(self, ids, created, price, start, end, category, status):
+        self.ids = ids
+        self.created = created
+        self.price = price
+        self.start = start
+        self.end = end
+        self.category = category
+        self.status = status
+        self.category_names = {}
+        self._id_order = np.argsort(ids, kind='stable')
+        self._intervals = None
+
+    def row_of(self, offer_id):
+        """Row index holding offer_id, or None"""
+        position = np.searchsorted(self.ids, offer_id, sorter=self._id_order)
+        if position < len(self.ids):
+            row = int(self._id_order[position])
+            if self.ids[row] == offer_id:
+                return row
+        return None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build columns from (id, created_at, price, start, end, category_id, status) rows"""
+        rows = list(rows)
+        count = len(rows)
+        ids, created, price, start, end, category, status = zip(*rows) if rows else ((),) * 7
+
+        ids = np.fromiter(ids, dtype=np.int64, count=count)
+        created = np.fromiter(map(_to_micros, created), dtype=np.int64, count=count)
+        price = np.fromiter(map(_to_cents, price), dtype=np.int64, count=count)
+        start = np.fromiter((day.toordinal() for day in start), dtype=np.int32, count=count)
+        end = np.fromiter((day.toordinal() for day in end), dtype=np.int32, count=count)
+        category = np.fromiter(category, dtype=np.int64, count=count)
+        status = np.fromiter(
+            (STATUS_CODES.get(value, DELETED) for value in status), dtype=np.int8, count=count
+        )
+
+        # Newest first, ties broken by id - the same order as TravelOffer.Meta.ordering
+        order = np.lexsort((ids, created))[::-1]
+        return cls(
+            ids[order], created[order], price[order], start[order],
+            end[order], category[order], status[order],
+        )
+
+    def intervals(self):
+        """Interval index over the date ranges of approved rows, built on first use"""
+        if self._intervals is None:
+            self._intervals = IntervalIndex(
+                self.start, self.end, rows=np.flatnonzero(self.status == APPROVED)
+            )
+        return self._intervals
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class OfferCatalogue:
+    """Columnar, self-refreshing snapshot of all offers"""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'OFFER_CATALOGUE_MAX_AGE', 60)
+        self._lock = threading.RLock()
+        self._columns = None
+        self._version = None
+        self._built_at = 0.0
+
+    def _is_fresh(self):
+        return (
+            self._columns is not None
+            and self._version == get_catalogue_version()
+            and time.monotonic() - self._built_at < self.max_age
+        )
+
+    def rebuild(self):
+        """Reload every offer from the database"""
+        with self._lock:
+            version = get_catalogue_version()
+            rows = TravelOffer.objects.order_by().values_list(
+                'id', 'created_at', 'price', 'start_date', 'end_date', 'category_id', 'status'
+            ).iterator(chunk_size=10000)
+            columns = OfferColumns.from_rows(rows)
+            columns.category_names = dict(Category.objects.values_list('id', 'name'))
+            self._columns = columns
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._columns
+
+    def columns(self):
+        """Current columns, rebuilt first if another change made them stale"""
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self.rebuild()
+        return self._columns
+
+    def invalidate(self):
+        """Drop the local snapshot so the next read rebuilds it"""
+        with self._lock:
+            self._columns = None
+
+    def _record_local_change(self, patched):
+        # Keep our own patched snapshot only if nobody else changed the
+        # catalogue since we last synchronised
+        new_version = bump_catalogue_version()
+        if patched and self._version is not None and new_version == self._version + 1:
+            self._version = new_version
+        else:
+            self._columns = None
+
+    def apply_offer(self, offer):
+        """Patch a saved offer into the snapshot in place when possible"""
+        with self._lock:
+            columns = self._columns
+            row = columns.row_of(offer.pk) if columns is not None else None
+            if row is None:
+                # Offers outside the snapshot only matter once they are approved
+                patched = columns is not None and offer.status != 'approved'
+            else:
+                patched = columns.created[row] == _to_micros(offer.created_at)
+            if row is not None and patched:
+                columns.price[row] = _to_cents(offer.price)
+                columns.start[row] = offer.start_date.toordinal()
+                columns.end[row] = offer.end_date.toordinal()
+                columns.category[row] = offer.category_id
+                columns.status[row] = STATUS_CODES.get(offer.status, DELETED)
+                columns._intervals = None
+            self._record_local_change(patched)
+
+    def remove_offer(self, offer_id):
+        """Hide a deleted offer from the snapshot"""
+        with self._lock:
+            columns = self._columns
+            row = columns.row_of(offer_id) if columns is not None else None
+            if row is not None:
+                columns.status[row] = DELETED
+                columns._intervals = None
+            self._record_local_change(columns is not None)
+
+    def filter_mask(self, columns, category_id=None, min_price=None, max_price=None,
+                    start_date=None, end_date=None, date_match=WITHIN):
+        """Boolean mask of approved offers matching the listing filters"""
+        if start_date or end_date:
+            lo = start_date.toordinal() if start_date else None
+            hi = end_date.toordinal() if end_date else None
+            intervals = columns.intervals()
+            mask = intervals.overlapping(lo, hi) if date_match == OVERLAP else intervals.within(lo, hi)
+        else:
+            mask = columns.status == APPROVED
+        if category_id:
+            mask &= columns.category == int(category_id)
+        if min_price is not None:
+            mask &= columns.price >= _to_cents(min_price)
+        if max_price is not None:
+            mask &= columns.price <= _to_cents(max_price)
+        return mask
+
+    def filter_ids(self, **filters):
+        """Ids of approved offers matching the filters, newest first"""
+        columns = self.columns()
+        return columns.ids[self.filter_mask(columns, **filters)]
+
+    def facets(self, **filters):
+        """Category, price and start-month counts for offers matching the filters"""
+        columns = self.columns()
+        return facets_from_columns(
+            columns, self.filter_mask(columns, **filters), columns.category_names
+        )
+
+    def departures(self, start_date, end_date, bucket_days=7, **filters):
+        """[(bucket start date, count)] of approved offers departing in each bucket"""
+        columns = self.columns()
+        intervals = columns.intervals()
+        mask = None
+        if any(value not in (None, '') for value in filters.values()):
+            mask = self.filter_mask(columns, **filters)
+        buckets = intervals.departures(
+            start_date.toordinal(), end_date.toordinal(), bucket_days=bucket_days, mask=mask
+        )
+        return [(date.fromordinal(day), count) for day, count in buckets]
+
+    def filter(self, **filters):
+        """Approved offers matching the filters as a lazily loaded sequence"""
+        columns = self.columns()
+        mask = self.filter_mask(columns, **filters)
+        return OfferIdSequence(columns.ids[mask], created=columns.created[mask])
+
+
+class OfferIdSequence:
+    """
+    Lazily loaded list of offers backed by an ordered id array.
+
+    Supports ``len()``/``count()`` and slicing, which is all
+    ``django.core.paginator.Paginator`` needs; slicing loads just that page.
+    When the matching ``created_at`` column is supplied the sequence can also
+    ``seek()`` to a (created_at, id) key for keyset pagination.
+    """
+    model = TravelOffer
+
+    def __init__(self, ids, created=None, queryset=None):
+        self.ids = ids
+        self.created = created
+        self.queryset = queryset if queryset is not None else (
+            TravelOffer.objects.filter(status='approved').select_related(*LISTING_RELATED)
+        )
+
+    @property
+    def ordering(self):
+        return ('-created_at', '-id') if self.created is not None else ()
+
+    def seek(self, key, after=True):
+        """Position just past (after=True) or just before a (created_at, id) key"""
+        created_at, offer_id = key
+        created = _to_micros(created_at)
+        same_time = self.created == created
+        before = (self.created > created) | (same_time & (self.ids > offer_id))
+        if after:
+            before |= same_time & (self.ids == offer_id)
+        return int(np.count_nonzero(before))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.load(self.ids[index])
+        offers = self.load([self.ids[index]])
+        if not offers:
+            raise IndexError(index)
+        return offers[0]
+
+    def load(self, ids):
+        """Fetch offers for ids in one query, keeping the id order"""
+        ids = [int(offer_id) for offer_id in ids]
+        if not ids:
+            return []
+        offers = self.queryset.in_bulk(ids)
+        return [offers[offer_id] for offer_id in ids if offer_id in offers]
+
+
+offer_catalogue = OfferCatalogue()
+
+
+def catalogue_enabled():
+    return getattr(settings, 'OFFER_CATALOGUE_ENABLED', True)
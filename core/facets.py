@@ -0,0 +1,101 @@
+"""
+Facet counts for the offers search form.
+
+For a given filter set we report how many offers fall in each category, in
+each price bucket and in each start month. Both implementations produce the
+same structure in a single pass:
+
+* ``facets_from_columns`` - one sweep over the in-memory offer catalogue
+* ``facets_from_queryset`` - one grouped query, folded into facets in Python
+"""
+from collections import Counter
+from datetime import date
+
+import numpy as np
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import TruncMonth
+
+
+# Upper bounds (exclusive) of the price buckets, in dollars; the last bucket is open-ended
+PRICE_BUCKET_EDGES = (100, 200, 300, 400, 500, 750, 1000, 1500, 2000)
+
+# date.toordinal() of the NumPy datetime64 epoch (1970-01-01)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _price_buckets(counts):
+    lower_bounds = (0,) + PRICE_BUCKET_EDGES
+    upper_bounds = PRICE_BUCKET_EDGES + (None,)
+    return [
+        {'min': low, 'max': high, 'count': int(counts.get(index, 0))}
+        for index, (low, high) in enumerate(zip(lower_bounds, upper_bounds))
+    ]
+
+
+def _build(total, category_counts, category_names, price_counts, month_counts):
+    categories = [
+        {'id': category_id, 'name': category_names.get(category_id, ''), 'count': int(count)}
+        for category_id, count in category_counts.items() if count
+    ]
+    categories.sort(key=lambda item: item['name'])
+    return {
+        'total': int(total),
+        'categories': categories,
+        'price': _price_buckets(price_counts),
+        'start_month': [
+            {'month': month, 'count': int(count)}
+            for month, count in sorted(month_counts.items()) if count
+        ],
+    }
+
+
+def facets_from_columns(columns, mask, category_names):
+    """Facet counts for the catalogue rows selected by mask"""
+    category = columns.category[mask]
+    price = columns.price[mask]
+    start = columns.start[mask]
+
+    category_ids, category_totals = np.unique(category, return_counts=True)
+    edges = np.array(PRICE_BUCKET_EDGES, dtype=np.int64) * 100
+    price_index = np.searchsorted(edges, price, side='right')
+    price_totals = np.bincount(price_index, minlength=len(edges) + 1)
+    months = (start.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+    month_values, month_totals = np.unique(months, return_counts=True)
+
+    return _build(
+        total=len(category),
+        category_counts=dict(zip(category_ids.tolist(), category_totals.tolist())),
+        category_names=category_names,
+        price_counts=dict(enumerate(price_totals.tolist())),
+        month_counts={str(month): count for month, count in zip(month_values, month_totals.tolist())},
+    )
+
+
+def facets_from_queryset(queryset):
+    """Facet counts for an offer queryset using one grouped query"""
+    price_bucket = Case(
+        *[When(price__lt=edge, then=Value(index)) for index, edge in enumerate(PRICE_BUCKET_EDGES)],
+        default=Value(len(PRICE_BUCKET_EDGES)),
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket, start_month=TruncMonth('start_date'))
+        .values('category_id', 'category__name', 'price_bucket', 'start_month')
+        .annotate(offers=Count('id'))
+    )
+
+    total = 0
+    category_counts = Counter()
+    category_names = {}
+    price_counts = Counter()
+    month_counts = Counter()
+    for row in rows:
+        count = row['offers']
+        total += count
+        category_counts[row['category_id']] += count
+        category_names[row['category_id']] = row['category__name']
+        price_counts[row['price_bucket']] += count
+        month_counts[row['start_month'].strftime('%Y-%m')] += count
+
+    return _build(total, category_counts, category_names, price_counts, month_counts)
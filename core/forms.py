@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
 from .models import UserProfile, TravelOffer, Booking, Message, Review, Category
+from .repositories import UserRepository
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -28,10 +29,24 @@ class CustomUserCreationForm(UserCreationForm):
         self.fields['password1'].widget.attrs['placeholder'] = 'Password'
         self.fields['password2'].widget.attrs['placeholder'] = 'Confirm Password'
         self.fields['phone'].widget.attrs['placeholder'] = 'Phone Number'
+        
+        # Check-as-you-type availability hints (static/js/availability.js)
+        self.fields['username'].widget.attrs['data-availability'] = 'username'
+        self.fields['email'].widget.attrs['data-availability'] = 'email'
+    
+    def clean_username(self):
+        """Reject usernames that differ only in case, using the LOWER(username) index"""
+        username = self.cleaned_data.get('username')
+        if username and UserRepository.username_taken(username):
+            self._update_errors(ValidationError({
+                'username': self.instance.unique_error_message(User, ['username'])
+            }))
+        else:
+            return username
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if UserRepository.email_taken(email):
             raise ValidationError("This email is already registered.")
         return email
     
@@ -212,6 +227,23 @@ class SearchForm(forms.Form):
         required=False,
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
+    date_match = forms.ChoiceField(
+        choices=[
+            ('within', 'Trip fits within these dates'),
+            ('overlap', 'Trip overlaps these dates'),
+        ],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    sort = forms.ChoiceField(
+        choices=[
+            ('newest', 'Newest'),
+            ('popular', 'Most popular'),
+            ('trending', 'Trending'),
+        ],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
 
 
 class OfferStatusForm(forms.Form):
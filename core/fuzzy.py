@@ -0,0 +1,195 @@
+"""
+Typo-tolerant offer matching with a trigram index.
+
+Every distinct word of an approved offer's destination and title is split into
+padded character trigrams (``"uluru"`` -> ``"  u", " ul", "ulu", "lur",
+"uru", "ru "``). A query word is compared against the whole vocabulary in one
+vectorised pass: shared trigram counts come from ``np.bincount`` over the
+posting lists and similarity is ``shared / (|query| + |word| - shared)``, the
+same measure as PostgreSQL's ``pg_trgm``.
+
+The index is only consulted when exact full-text search returns fewer than
+``FUZZY_MIN_RESULTS`` offers, so the common path never pays for it. Like the
+autocomplete index it is rebuilt lazily when the catalogue version changes or
+after ``FUZZY_INDEX_MAX_AGE`` seconds.
+"""
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, FloatField, Value, When
+
+from .catalogue import get_catalogue_version
+from .models import TravelOffer
+from .search import tokenize
+
+
+# Destination words count for more than title words when ranking fuzzy matches
+FUZZY_FIELD_WEIGHTS = {'destination': 1.0, 'title': 0.8}
+
+MIN_WORD_LENGTH = 3
+
+
+def trigrams(word):
+    """Padded character trigrams of a single word"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _words(text):
+    return {token for token in tokenize(text) if len(token) >= MIN_WORD_LENGTH and not token.isdigit()}
+
+
+class TrigramIndex:
+    """Immutable trigram index over the destination and title words of offers"""
+
+    def __init__(self, rows):
+        # rows: iterable of (offer_id, destination, title)
+        word_offers = defaultdict(dict)
+        for offer_id, destination, title in rows:
+            for field, text in (('destination', destination), ('title', title)):
+                weight = FUZZY_FIELD_WEIGHTS[field]
+                for word in _words(text):
+                    offers = word_offers[word]
+                    offers[offer_id] = max(offers.get(offer_id, 0.0), weight)
+
+        self.words = sorted(word_offers)
+        self.offer_count = len({offer_id for offers in word_offers.values() for offer_id in offers})
+
+        postings = defaultdict(list)
+        sizes = np.empty(len(self.words), dtype=np.int32)
+        for word_id, word in enumerate(self.words):
+            grams = trigrams(word)
+            sizes[word_id] = len(grams)
+            for gram in grams:
+                postings[gram].append(word_id)
+        self.trigram_counts = sizes
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        # word id -> offers, as flat arrays addressed through offsets
+        self.offsets = np.zeros(len(self.words) + 1, dtype=np.int64)
+        offer_ids, weights = [], []
+        for word_id, word in enumerate(self.words):
+            offers = word_offers[word]
+            offer_ids.extend(offers.keys())
+            weights.extend(offers.values())
+            self.offsets[word_id + 1] = len(offer_ids)
+        self.offer_ids = np.array(offer_ids, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float32)
+
+    def similar_words(self, word, threshold):
+        """[(word_id, similarity)] for vocabulary words similar to word"""
+        grams = [gram for gram in trigrams(word) if gram in self.postings]
+        if not grams:
+            return []
+        shared = np.bincount(
+            np.concatenate([self.postings[gram] for gram in grams]),
+            minlength=len(self.words),
+        )
+        candidates = np.flatnonzero(shared)
+        overlap = shared[candidates]
+        similarity = overlap / (len(trigrams(word)) + self.trigram_counts[candidates] - overlap)
+        keep = similarity >= threshold
+        return list(zip(candidates[keep].tolist(), similarity[keep].tolist()))
+
+    def rank(self, query, threshold=0.3):
+        """Return [(offer_id, score)] for query, best match first
+
+        Each query word contributes its best weighted similarity for an offer;
+        scores are normalised by the number of query words so a perfect match
+        on every word scores 1.0.
+        """
+        words = [word for word in tokenize(query) if len(word) >= MIN_WORD_LENGTH]
+        if not words:
+            return []
+        scores = defaultdict(float)
+        for word in words:
+            best = {}
+            for word_id, similarity in self.similar_words(word, threshold):
+                start, stop = self.offsets[word_id], self.offsets[word_id + 1]
+                for offer_id, weight in zip(self.offer_ids[start:stop].tolist(),
+                                            self.weights[start:stop].tolist()):
+                    score = similarity * weight
+                    if score > best.get(offer_id, 0.0):
+                        best[offer_id] = score
+            for offer_id, score in best.items():
+                scores[offer_id] += score / len(words)
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+class FuzzyOfferMatcher:
+    """Self-refreshing holder for the current TrigramIndex"""
+
+    def __init__(self, max_age=None, threshold=None, max_results=None):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'FUZZY_INDEX_MAX_AGE', 600)
+        self.threshold = threshold if threshold is not None else getattr(settings, 'FUZZY_SIMILARITY_THRESHOLD', 0.3)
+        self.max_results = max_results or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+        self._lock = threading.RLock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+
+    def _is_fresh(self):
+        return (
+            self._index is not None
+            and self._version == get_catalogue_version()
+            and time.monotonic() - self._built_at < self.max_age
+        )
+
+    def rebuild(self):
+        """Rebuild the trigram index from approved offers"""
+        with self._lock:
+            version = get_catalogue_version()
+            rows = (
+                TravelOffer.objects.filter(status='approved')
+                .order_by()
+                .values_list('id', 'destination', 'title')
+                .iterator(chunk_size=10000)
+            )
+            self._index = TrigramIndex(rows)
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._index
+
+    def index(self):
+        """Current index, rebuilt first if stale; threads queued on the lock reuse the rebuild"""
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self.rebuild()
+        return self._index
+
+    def rank(self, query):
+        return self.index().rank(query, self.threshold)[:self.max_results]
+
+    def search(self, queryset, query, exact_ids=()):
+        """
+        Offers in queryset matching query fuzzily, annotated with ``search_rank``.
+
+        ``exact_ids`` (already ordered by relevance) always rank above fuzzy
+        matches, so this can widen a short list of exact results.
+        """
+        ranked = {offer_id: score for offer_id, score in self.rank(query)}
+        for position, offer_id in enumerate(exact_ids):
+            ranked[offer_id] = 2.0 - position / (len(exact_ids) + 1)
+        if not ranked:
+            return queryset.none()
+        rank = Case(
+            *[When(id=offer_id, then=Value(score)) for offer_id, score in ranked.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(id__in=list(ranked))
+            .annotate(search_rank=rank)
+            .order_by('-search_rank', '-created_at', '-id')
+        )
+
+
+fuzzy_offer_matcher = FuzzyOfferMatcher()
+
+
+def fuzzy_search_enabled():
+    return getattr(settings, 'FUZZY_SEARCH_ENABLED', True)
@@ -0,0 +1,77 @@
+"""
+Destination-to-image resolution for offers without an uploaded image.
+
+A keyword table (``DESTINATION_IMAGES`` in settings, or the defaults below)
+is compiled once into a single alternation regex, longest keywords first, so
+resolving an offer is one scan of its destination (then its title) instead of
+a substring check per keyword. Offers store the result in ``static_image``
+when saved, so pages never resolve it while rendering.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+
+DEFAULT_DESTINATION_IMAGES = (
+    ('gold coast', 'images/gold-coast-sunny.jpg'),
+    ('uluru', 'images/uluru.jpg'),
+    ('byron', 'images/byron-bay.jpg'),
+    ('cairns', 'images/cairns.jpg'),
+    ('sunshine coast', 'images/sunshine-coast.jpg'),
+    ('sunshine', 'images/sunshine-coast.jpg'),
+    ('broome', 'images/broome.jpg'),
+    ('whitsunday', 'images/whitsundays.jpg'),
+    ('margaret river', 'images/margaret-river.jpg'),
+    ('margaret', 'images/margaret-river.jpg'),
+    ('great ocean road', 'images/great-ocean-road.jpg'),
+    ('kangaroo island', 'images/kangaroo-island.jpg'),
+)
+DEFAULT_IMAGE = 'images/gold-coast-sunny.jpg'
+
+SEPARATOR_RE = re.compile(r'[\s\-_]+')
+
+
+def _normalize(keyword):
+    return ' '.join(SEPARATOR_RE.split(keyword.strip().lower()))
+
+
+class DestinationImageResolver:
+    """Resolve a static image path from offer text with one compiled regex"""
+
+    def __init__(self, keywords, default=DEFAULT_IMAGE):
+        self.default = default
+        self.images = {}
+        for keyword, image in keywords:
+            # The first entry for a keyword wins, like a dict literal would
+            self.images.setdefault(_normalize(keyword), image)
+
+        # "gold coast", "gold-coast" and "gold_coast" all match the same keyword
+        alternatives = [
+            r'[\s\-_]+'.join(re.escape(word) for word in keyword.split())
+            for keyword in sorted(self.images, key=len, reverse=True)
+        ]
+        self.pattern = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def match(self, text):
+        """Image for the first keyword found in text, or None"""
+        if self.pattern is None or not text:
+            return None
+        found = self.pattern.search(text.lower())
+        return self.images[_normalize(found.group(0))] if found else None
+
+    def resolve(self, destination, title=''):
+        """Image for an offer: destination keywords first, then title keywords"""
+        return self.match(destination) or self.match(title) or self.default
+
+
+@lru_cache(maxsize=1)
+def get_image_resolver():
+    return DestinationImageResolver(
+        getattr(settings, 'DESTINATION_IMAGES', DEFAULT_DESTINATION_IMAGES),
+        getattr(settings, 'DEFAULT_DESTINATION_IMAGE', DEFAULT_IMAGE),
+    )
+
+
+def resolve_destination_image(destination, title=''):
+    return get_image_resolver().resolve(destination, title)
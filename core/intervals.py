@@ -0,0 +1,119 @@
+"""
+Sorted-endpoint interval index over offer date ranges.
+
+Offer trips are closed ``[start_date, end_date]`` intervals stored as day
+ordinals. Keeping the row numbers sorted once by start and once by end turns
+every date-window question into a couple of ``searchsorted`` calls:
+
+* overlap - trips sharing at least one day with a window ("my semester break")
+* within - trips that start and finish inside a window
+* stabbing - trips in progress on a given day
+* departures - trips starting in each week (or any bucket) of a window
+
+Because ``start <= end`` for every trip, the trips that do *not* overlap
+``[lo, hi]`` are exactly those starting after ``hi`` plus those ending before
+``lo``, two disjoint prefix/suffix slices of the sorted arrays; overlap counts
+therefore cost O(log n) and overlap masks only touch the excluded rows.
+"""
+import numpy as np
+
+
+# date.toordinal() is 1 for Monday 0001-01-01
+MONDAY_OFFSET = 1
+
+
+class IntervalIndex:
+    """Immutable index over the intervals of a subset of catalogue rows"""
+
+    def __init__(self, start, end, rows=None):
+        # rows maps index positions to catalogue rows; defaults to all rows
+        self.size = len(start)
+        self.rows = np.arange(len(start)) if rows is None else rows
+        start = start[self.rows]
+        end = end[self.rows]
+        self.by_start = self.rows[np.argsort(start, kind='stable')]
+        self.starts = np.sort(start, kind='stable')
+        self.by_end = self.rows[np.argsort(end, kind='stable')]
+        self.ends = np.sort(end, kind='stable')
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def _span(values, lo=None, hi=None):
+        """Slice bounds of sorted values falling in [lo, hi]"""
+        first = 0 if lo is None else int(np.searchsorted(values, lo, side='left'))
+        last = len(values) if hi is None else int(np.searchsorted(values, hi, side='right'))
+        return first, max(first, last)
+
+    def _mask(self, rows=None, fill=False):
+        mask = np.full(self.size, fill, dtype=bool)
+        if rows is not None:
+            mask[rows] = not fill
+        return mask
+
+    # -- counts ------------------------------------------------------------
+
+    def count_overlapping(self, lo, hi):
+        """Number of intervals sharing at least one day with [lo, hi]"""
+        starts_after = len(self.starts) - self._span(self.starts, hi=hi)[1]
+        ends_before = self._span(self.ends, hi=lo - 1)[1]
+        return len(self.rows) - starts_after - ends_before
+
+    def count_stabbing(self, day):
+        """Number of intervals containing day"""
+        return self.count_overlapping(day, day)
+
+    # -- masks -------------------------------------------------------------
+
+    def overlapping(self, lo=None, hi=None):
+        """Mask of intervals sharing at least one day with [lo, hi] (open ends allowed)"""
+        mask = self._mask(self.rows)
+        if hi is not None:
+            first = self._span(self.starts, hi=hi)[1]
+            mask[self.by_start[first:]] = False
+        if lo is not None:
+            last = self._span(self.ends, hi=lo - 1)[1]
+            mask[self.by_end[:last]] = False
+        return mask
+
+    def within(self, lo=None, hi=None):
+        """Mask of intervals starting on/after lo and ending on/before hi"""
+        first, last = self._span(self.starts, lo=lo, hi=hi)
+        candidates = self.by_start[first:last]
+        if hi is None:
+            return self._mask(candidates)
+        # start is already <= hi; keep the candidates that also end by hi
+        first, last = self._span(self.ends, lo=lo, hi=hi)
+        mask = self._mask(candidates)
+        mask &= self._mask(self.by_end[first:last])
+        return mask
+
+    def stabbing(self, day):
+        """Mask of intervals in progress on day"""
+        return self.overlapping(day, day)
+
+    # -- histograms --------------------------------------------------------
+
+    def departures(self, lo, hi, bucket_days=7, mask=None):
+        """
+        [(bucket_start, count)] of intervals starting in each bucket of [lo, hi].
+
+        Weekly buckets are aligned to Mondays, like ``TruncWeek``. ``mask``
+        restricts the count to a subset of rows (for example other search filters).
+        """
+        first_edge = lo - (lo - MONDAY_OFFSET) % 7 if bucket_days == 7 else lo
+        edges = np.arange(first_edge, hi + 1, bucket_days, dtype=np.int64)
+        if mask is None:
+            # Pure binary search on the sorted starts, independent of n
+            bounds = np.searchsorted(self.starts, np.append(edges, edges[-1] + bucket_days), side='left')
+            lower = np.searchsorted(self.starts, lo, side='left')
+            upper = np.searchsorted(self.starts, hi, side='right')
+            bounds = np.clip(bounds, lower, upper)
+            counts = np.diff(bounds)
+        else:
+            first, last = self._span(self.starts, lo=lo, hi=hi)
+            rows = self.by_start[first:last]
+            starts = self.starts[first:last][mask[rows]]
+            counts = np.bincount((starts - first_edge) // bucket_days, minlength=len(edges))
+        return list(zip(edges.tolist(), counts.tolist()))
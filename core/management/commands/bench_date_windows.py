@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+from core.catalogue import OVERLAP, WITHIN, OfferCatalogue
+from core.repositories import TravelOfferRepository
+from core.services import OfferService
+
+from .bench_offer_filters import Command as FilterBenchmark
+
+
+class Command(FilterBenchmark):
+    help = (
+        'Benchmark date-window queries (overlap, within, stabbing, weekly '
+        'departures) through ORM range filters against the catalogue interval '
+        'index. Synthetic offers are inserted inside a transaction that is '
+        'rolled back afterwards.'
+    )
+
+    def windows(self):
+        today = date.today()
+        break_start = today + timedelta(days=90)
+        return [
+            ('2 weeks', break_start, break_start + timedelta(days=14)),
+            ('3 months', break_start, break_start + timedelta(days=90)),
+        ]
+
+    def run(self, size, categories, repeat):
+        catalogue = OfferCatalogue(max_age=float('inf'))
+        catalogue.rebuild()
+        columns = catalogue.columns()
+        intervals = columns.intervals()
+        self.stdout.write(f'{"query":<26}{"matches":>10}{"ORM":>12}{"index":>12}{"speedup":>10}')
+
+        def report(name, orm, indexed, matches_of=lambda result: result):
+            orm_result, index_result = orm(), indexed()
+            if orm_result != index_result:
+                self.stderr.write(f'  {name}: index and ORM results differ')
+            orm_ms = self.timed(orm, repeat)
+            index_ms = self.timed(indexed, repeat)
+            self.stdout.write(
+                f'{name:<26}{matches_of(index_result):>10,}{orm_ms:>10.2f}ms'
+                f'{index_ms:>10.3f}ms{orm_ms / index_ms:>9.1f}x'
+            )
+
+        approved = TravelOfferRepository.get_all_approved_offers()
+        for label, start, end in self.windows():
+            report(
+                f'overlap {label} (count)',
+                lambda: TravelOfferRepository.get_offers_overlapping_dates(start, end).count(),
+                lambda: intervals.count_overlapping(start.toordinal(), end.toordinal()),
+            )
+            for date_match in (OVERLAP, WITHIN):
+                filters = {'start_date': start, 'end_date': end, 'date_match': date_match}
+                report(
+                    f'{date_match} {label} ids',
+                    lambda: sorted(
+                        OfferService.filter_offers(approved, **filters).values_list('id', flat=True)
+                    ),
+                    lambda: sorted(catalogue.filter_ids(**filters).tolist()),
+                    matches_of=len,
+                )
+
+        day = date.today() + timedelta(days=120)
+        report(
+            'stabbing (count)',
+            lambda: approved.filter(start_date__lte=day, end_date__gte=day).count(),
+            lambda: intervals.count_stabbing(day.toordinal()),
+        )
+
+        # The next July, which the synthetic start dates (up to a year ahead) cover
+        today = date.today()
+        july = date(today.year + (today.month >= 7), 7, 1)
+        july_end = date(july.year, 7, 31)
+        report(
+            'departures by week',
+            lambda: TravelOfferRepository.get_departures_by_week(approved, july, july_end),
+            lambda: catalogue.departures(july, july_end),
+            matches_of=lambda weeks: sum(count for _, count in weeks),
+        )
+        report(
+            'departures + category',
+            lambda: TravelOfferRepository.get_departures_by_week(
+                approved.filter(category_id=categories[0].id), july, july_end
+            ),
+            lambda: catalogue.departures(july, july_end, category_id=categories[0].id),
+            matches_of=lambda weeks: sum(count for _, count in weeks),
+        )
@@ -0,0 +1,163 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.fuzzy import FuzzyOfferMatcher
+from core.models import Category, TravelOffer
+from core.search import InMemorySearchBackend
+
+
+DESTINATIONS = [
+    'Whitsundays, QLD', 'Uluru, NT', 'Margaret River, WA', 'Byron Bay, NSW',
+    'Gold Coast, QLD', 'Cairns, QLD', 'Kangaroo Island, SA', 'Blue Mountains, NSW',
+    'Great Ocean Road, VIC', 'Fraser Island, QLD', 'Rottnest Island, WA',
+    'Cradle Mountain, TAS', 'Kakadu, NT', 'Barossa Valley, SA', 'Noosa, QLD',
+    'Jervis Bay, NSW', 'Wilsons Promontory, VIC', 'Freycinet, TAS', 'Broome, WA',
+    'Daintree, QLD', 'Hunter Valley, NSW', 'Port Douglas, QLD', 'Esperance, WA',
+    'Grampians, VIC', 'Kimberley, WA', 'Ningaloo, WA', 'Phillip Island, VIC',
+]
+TITLE_WORDS = [
+    'adventure', 'escape', 'getaway', 'retreat', 'explorer', 'discovery',
+    'weekend', 'expedition', 'journey', 'tour', 'camping', 'sailing',
+]
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure recall and latency of exact versus typo-tolerant (trigram) '
+        'offer search on a generated catalogue. Synthetic offers are inserted '
+        'inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000])
+        parser.add_argument('--queries', type=int, default=200, help='Misspelled queries per size')
+        parser.add_argument('--synthetic-destinations', type=int, default=2000,
+                            help='Extra generated place names, so the vocabulary is realistic')
+        parser.add_argument('--top', type=int, default=10, help='Recall is measured in the top N results')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        destinations = DESTINATIONS + [
+            self.place_name() for _ in range(options['synthetic_destinations'])
+        ]
+        for size in options['sizes']:
+            with transaction.atomic():
+                self.populate(size, destinations)
+                self.run(size, options['queries'], options['top'])
+                transaction.set_rollback(True)
+
+    def place_name(self):
+        syllables = ['ka', 'ra', 'lo', 'mi', 'ta', 'wo', 'na', 'be', 'ro', 'gu', 'li', 'don', 'ville', 'ton']
+        name = ''.join(self.rng.choice(syllables) for _ in range(self.rng.randint(2, 4)))
+        return f'{name.capitalize()}, {self.rng.choice(["NSW", "VIC", "QLD", "WA", "SA", "TAS", "NT"])}'
+
+    def misspell(self, word):
+        """Apply one random edit (delete, insert, substitute or transpose)"""
+        position = self.rng.randrange(1, len(word))
+        edit = self.rng.choice(('delete', 'insert', 'substitute', 'transpose'))
+        if edit == 'delete':
+            return word[:position] + word[position + 1:]
+        if edit == 'insert':
+            return word[:position] + self.rng.choice(LETTERS) + word[position:]
+        if edit == 'substitute':
+            return word[:position] + self.rng.choice(LETTERS) + word[position + 1:]
+        if position == len(word) - 1:
+            position -= 1
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+    def populate(self, size, destinations):
+        self.stdout.write(f'\nInserting {size:,} synthetic offers...')
+        advertiser = User.objects.create(username=f'bench-fuzzy-{size}')
+        category = Category.objects.create(name=f'Bench fuzzy {size}')
+        today = date.today()
+        batch = []
+        for i in range(size):
+            start = today + timedelta(days=self.rng.randint(0, 365))
+            destination = self.rng.choice(destinations)
+            batch.append(TravelOffer(
+                title=f'{destination.split(",")[0]} {self.rng.choice(TITLE_WORDS)} {i}',
+                description='Synthetic offer used for benchmarking.',
+                destination=destination,
+                category=category,
+                advertiser=advertiser,
+                price=Decimal(self.rng.randint(5000, 300000)) / 100,
+                available_spots=self.rng.randint(1, 40),
+                start_date=start,
+                end_date=start + timedelta(days=self.rng.randint(2, 14)),
+                status='approved',
+            ))
+            if len(batch) == 5000:
+                TravelOffer.objects.bulk_create(batch)
+                batch = []
+        TravelOffer.objects.bulk_create(batch)
+
+    def queries(self, count):
+        """(misspelled query, expected destination) pairs for destinations that exist"""
+        existing = list(
+            TravelOffer.objects.filter(status='approved', destination__in=DESTINATIONS)
+            .values_list('destination', flat=True).distinct()
+        )
+        pairs = []
+        for _ in range(count):
+            destination = self.rng.choice(existing)
+            words = destination.split(',')[0].split()
+            typo_at = self.rng.randrange(len(words))
+            words[typo_at] = self.misspell(words[typo_at].lower())
+            pairs.append((' '.join(words), destination))
+        return pairs
+
+    @staticmethod
+    def percentile(values, fraction):
+        values = sorted(values)
+        return values[min(int(len(values) * fraction), len(values) - 1)]
+
+    def run(self, size, query_count, top):
+        exact = InMemorySearchBackend(max_results=top)
+        started = time.perf_counter()
+        exact.rebuild()
+        exact_build_ms = (time.perf_counter() - started) * 1000
+
+        matcher = FuzzyOfferMatcher(max_age=float('inf'), max_results=top)
+        started = time.perf_counter()
+        index = matcher.rebuild()
+        fuzzy_build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f'Exact index build: {exact_build_ms:,.0f} ms; trigram index build: {fuzzy_build_ms:,.0f} ms '
+            f'({len(index.words):,} words, {len(index.postings):,} trigrams)'
+        )
+
+        destinations = dict(TravelOffer.objects.filter(status='approved').values_list('id', 'destination'))
+        results = {'exact': ([], []), 'fuzzy fallback': ([], [])}
+        for query, expected in self.queries(query_count):
+            started = time.perf_counter()
+            exact_ids = [offer_id for offer_id, _ in (exact.rank(query) or [])[:top]]
+            exact_ms = (time.perf_counter() - started) * 1000
+            results['exact'][0].append(any(destinations.get(i) == expected for i in exact_ids))
+            results['exact'][1].append(exact_ms)
+
+            started = time.perf_counter()
+            ids = exact_ids
+            if len(ids) < top:
+                ids = (exact_ids + [
+                    offer_id for offer_id, _ in matcher.rank(query) if offer_id not in exact_ids
+                ])[:top]
+            fallback_ms = exact_ms + (time.perf_counter() - started) * 1000
+            results['fuzzy fallback'][0].append(any(destinations.get(i) == expected for i in ids))
+            results['fuzzy fallback'][1].append(fallback_ms)
+
+        self.stdout.write(f'{"strategy":<16}{"recall@" + str(top):>12}{"p50":>10}{"p95":>10}')
+        for name, (hits, timings) in results.items():
+            recall = sum(hits) / len(hits)
+            self.stdout.write(
+                f'{name:<16}{recall:>12.1%}{statistics.median(timings):>8.2f}ms'
+                f'{self.percentile(timings, 0.95):>8.2f}ms'
+            )
@@ -0,0 +1,128 @@
+import logging
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from core.throttle import Bucket, MemoryBucketStore, SQLiteBucketStore, login_throttle
+
+
+LEGIT_USERNAME = 'bench-login-user'
+LEGIT_PASSWORD = 'correct horse battery staple'
+LEGIT_ADDR = '10.255.0.1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how many login requests one worker handles during a credential '
+        'stuffing burst, with the login throttle off, with in-process buckets and '
+        'with the shared SQLite bucket store. A legitimate user logs in throughout '
+        'while part of the attack targets its username; the command fails if the '
+        'throttle ever refuses that user. Its user is created in a transaction that '
+        'is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=30, help='Duration of each scenario')
+        parser.add_argument('--attackers', type=int, default=2, help='Distinct attacking IP addresses')
+        parser.add_argument('--ip-burst', type=int, default=None, help='Override LOGIN_THROTTLE_IP_BURST')
+        parser.add_argument('--ip-per-minute', type=float, default=None,
+                            help='Override LOGIN_THROTTLE_IP_PER_MINUTE')
+        parser.add_argument('--legit-every', type=int, default=20,
+                            help='One legitimate login per this many requests')
+        parser.add_argument('--target-share', type=float, default=0.5,
+                            help="Share of attack attempts aimed at the legitimate user's username")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        # Every rejected attempt would otherwise log a "Too Many Requests" warning
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        saved = login_throttle.enabled, login_throttle._store, login_throttle.ip
+        login_throttle.ip = Bucket(
+            'ip',
+            options['ip_burst'] or login_throttle.ip.burst,
+            options['ip_per_minute'] or login_throttle.ip.rate * 60,
+        )
+        directory = tempfile.mkdtemp(prefix='login-throttle-')
+        scenarios = [
+            ('no throttle', False, None),
+            ('memory buckets', True, MemoryBucketStore(50_000)),
+            ('sqlite buckets', True, SQLiteBucketStore(os.path.join(directory, 'buckets.sqlite3'))),
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.create_user(LEGIT_USERNAME, password=LEGIT_PASSWORD)
+                self.stdout.write(
+                    f'{options["seconds"]:g}s per scenario, {options["attackers"]} attacking IPs '
+                    f'(burst {login_throttle.ip.burst:g}, {login_throttle.ip.rate * 60:g}/min each), '
+                    f'1 legitimate login per {options["legit_every"]} requests, '
+                    f'{options["target_share"]:.0%} of the attack aimed at its username\n'
+                )
+                locked_out = []
+                for name, enabled, store in scenarios:
+                    login_throttle.enabled = enabled
+                    login_throttle._store = store
+                    login_throttle.reset_stats()
+                    if self.run(name, options['seconds'], options['attackers'], options['legit_every'],
+                                options['target_share']):
+                        locked_out.append(name)
+                transaction.set_rollback(True)
+        finally:
+            login_throttle.enabled, login_throttle._store, login_throttle.ip = saved
+        if locked_out:
+            raise CommandError(f'The attacked user could not log in with: {", ".join(locked_out)}')
+
+    def run(self, name, seconds, attackers, legit_every, target_share):
+        """Run one scenario; returns the number of refused legitimate logins"""
+        url = reverse('ajax_login')
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.')
+        attacker = Client(HTTP_HOST=host)
+        addresses = [f'203.0.113.{index + 1}' for index in range(attackers)]
+        statuses = {}
+        legit_ok = legit_failed = 0
+        legit_ms = []
+        requests = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            requests += 1
+            if requests % legit_every == 0:
+                request_started = time.perf_counter()
+                response = Client(HTTP_HOST=host).post(
+                    url, {'username': LEGIT_USERNAME, 'password': LEGIT_PASSWORD}, REMOTE_ADDR=LEGIT_ADDR
+                )
+                legit_ms.append((time.perf_counter() - request_started) * 1000)
+                if response.json()['ok']:
+                    legit_ok += 1
+                else:
+                    legit_failed += 1
+                continue
+            target = self.rng.random() < target_share
+            response = attacker.post(url, {
+                'username': LEGIT_USERNAME if target else f'user{self.rng.randrange(100_000)}',
+                'password': f'guess{self.rng.randrange(1_000_000)}',
+            }, REMOTE_ADDR=self.rng.choice(addresses))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        elapsed = time.perf_counter() - started
+
+        stats = login_throttle.stats()
+        hashed = stats['allowed'] if login_throttle.enabled else requests
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(
+            f'  {requests:,} requests in {elapsed:.1f}s = {requests / elapsed:,.1f} req/s; '
+            f'{hashed:,} password checks, {stats["rejected"]:,} rejected before hashing'
+        )
+        self.stdout.write(f'  attack responses by status: {dict(sorted(statuses.items()))}')
+        if legit_ms:
+            self.stdout.write(
+                f'  legitimate logins: {legit_ok} ok, {legit_failed} failed, '
+                f'mean {sum(legit_ms) / len(legit_ms):,.0f} ms'
+            )
+        return legit_failed
@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.catalogue import OfferCatalogue, OfferIdSequence
+from core.models import Category, TravelOffer
+from core.repositories import TravelOfferRepository
+from core.services import OfferService
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark offer list filtering through the ORM against the in-memory '
+        'columnar catalogue. Synthetic offers are inserted inside a transaction '
+        'that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per scenario')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        for size in options['sizes']:
+            with transaction.atomic():
+                categories = self.populate(size)
+                self.run(size, categories, options['repeat'])
+                transaction.set_rollback(True)
+
+    def populate(self, size):
+        self.stdout.write(f'\nInserting {size:,} synthetic offers...')
+        advertiser = User.objects.create(username=f'bench-advertiser-{size}')
+        categories = [
+            Category.objects.create(name=f'Bench category {size}-{i}') for i in range(8)
+        ]
+        statuses = ['approved'] * 8 + ['pending', 'rejected']
+        today = date.today()
+        batch = []
+        for i in range(size):
+            start = today + timedelta(days=self.rng.randint(0, 365))
+            batch.append(TravelOffer(
+                title=f'Bench offer {i}',
+                description='Synthetic offer used for benchmarking.',
+                destination='Benchmark',
+                category=self.rng.choice(categories),
+                advertiser=advertiser,
+                price=Decimal(self.rng.randint(5000, 300000)) / 100,
+                available_spots=self.rng.randint(1, 40),
+                start_date=start,
+                end_date=start + timedelta(days=self.rng.randint(2, 14)),
+                status=self.rng.choice(statuses),
+            ))
+            if len(batch) == 5000:
+                TravelOffer.objects.bulk_create(batch)
+                batch = []
+        TravelOffer.objects.bulk_create(batch)
+        return categories
+
+    def scenarios(self, categories):
+        today = date.today()
+        return [
+            ('no filters', {}),
+            ('category', {'category_id': categories[0].id}),
+            ('price range', {'min_price': Decimal('200'), 'max_price': Decimal('600')}),
+            ('date range', {'start_date': today + timedelta(days=30), 'end_date': today + timedelta(days=120)}),
+            ('all filters', {
+                'category_id': categories[1].id,
+                'min_price': Decimal('100'),
+                'max_price': Decimal('1500'),
+                'start_date': today + timedelta(days=60),
+                'end_date': today + timedelta(days=240),
+            }),
+        ]
+
+    @staticmethod
+    def timed(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run(self, size, categories, repeat):
+        catalogue = OfferCatalogue(max_age=float('inf'))
+        started = time.perf_counter()
+        columns = catalogue.rebuild()
+        build_ms = (time.perf_counter() - started) * 1000
+        memory = sum(getattr(columns, name).nbytes for name in (
+            'ids', 'created', 'price', 'start', 'end', 'category', 'status'
+        ))
+        self.stdout.write(
+            f'Catalogue build: {build_ms:,.0f} ms, {memory / 1024 / 1024:.1f} MiB of columns'
+        )
+        self.stdout.write(
+            f'{"scenario":<14}{"matches":>10}{"ORM page":>12}{"mask only":>12}{"catalogue page":>16}{"speedup":>10}'
+        )
+
+        for name, filters in self.scenarios(categories):
+            def orm_page():
+                offers = OfferService.filter_offers(
+                    TravelOfferRepository.get_all_approved_offers(), **filters
+                )
+                page = Paginator(offers, 12).page(1)
+                return page.paginator.count, [offer.id for offer in page]
+
+            def mask_only():
+                return catalogue.filter_ids(**filters)
+
+            def catalogue_page():
+                page = Paginator(OfferIdSequence(catalogue.filter_ids(**filters)), 12).page(1)
+                return page.paginator.count, [offer.id for offer in page]
+
+            orm_count, orm_ids = orm_page()
+            catalogue_count, catalogue_ids = catalogue_page()
+            if orm_count != catalogue_count or set(orm_ids) != set(catalogue_ids):
+                self.stderr.write(f'  {name}: catalogue and ORM results differ')
+
+            orm_ms = self.timed(orm_page, repeat)
+            mask_ms = self.timed(mask_only, repeat)
+            catalogue_ms = self.timed(catalogue_page, repeat)
+            self.stdout.write(
+                f'{name:<14}{catalogue_count:>10,}{orm_ms:>10.2f}ms{mask_ms:>10.3f}ms'
+                f'{catalogue_ms:>14.2f}ms{orm_ms / catalogue_ms:>9.1f}x'
+            )
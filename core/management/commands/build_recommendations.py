@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Build "students who liked this also liked" offer recommendations from '
+        'favourites and bookings. Only offers affected since the last build are '
+        'recomputed unless --full is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help='Neighbours stored per offer')
+        parser.add_argument('--full', action='store_true', help='Recompute every offer')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = build_recommendations(k=options['top_k'], full=options['full'], log=self.stdout.write)
+        elapsed = time.perf_counter() - started
+        kind = 'Full' if stats['full'] else 'Incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind} build: recomputed {stats['recomputed']:,} offers, "
+            f"stored {stats['stored']:,} recommendations in {elapsed:.1f}s"
+        ))
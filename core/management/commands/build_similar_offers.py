@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.similarity import build_similar_offers
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the most similar offers of every approved offer from TF-IDF '
+        'vectors of their title, description and destination.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=8, help='Similar offers stored per offer')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = build_similar_offers(top_n=options['top_n'], workers=options['workers'], log=self.stdout.write)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['stored']:,} similar offers for {stats['offers']:,} offers "
+            f"with {stats['workers']} worker(s) in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,145 @@
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Booking, Category, Favourite, Message, TravelOffer, UserProfile
+from core.permissions import visible_bookings
+from core.repositories import (
+    BookingRepository, CategoryRepository, FavouriteRepository,
+    MessageRepository, ReviewRepository, TravelOfferRepository, UserRepository,
+)
+
+
+# Tables a method may legitimately read in full (small lookup tables, or the
+# whole point of the query)
+ALLOWED_SCANS = {
+    'get_all_categories': {'core_category'},
+    'get_categories_with_offer_count': {'core_category'},
+}
+
+SQLITE_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the hot repository methods against a few sample rows, EXPLAIN every '
+        'query they issue and fail if any of them falls back to a full table scan. '
+        'The sample rows are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every captured plan')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            raise CommandError(f'Query plan checks are not implemented for {connection.vendor}')
+
+        failures = []
+        with transaction.atomic():
+            for name, call in self.calls(self.sample_rows()):
+                with CaptureQueriesContext(connection) as captured:
+                    result = call()
+                    # Evaluate lazy querysets so their SQL is captured
+                    if hasattr(result, '_fetch_all'):
+                        list(result)
+                method_scans = set()
+                for query in captured.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    plan, scanned = self.explain(sql)
+                    scanned -= ALLOWED_SCANS.get(name, set())
+                    if options['verbose_plans'] or scanned:
+                        self.stdout.write(f'\n{name}: {sql}\n{plan}')
+                    method_scans |= scanned
+                if method_scans:
+                    failures.append(f'{name}: full scan of {", ".join(sorted(method_scans))}')
+                self.stdout.write(f'{name:<36}{"FULL SCAN" if method_scans else "ok"}')
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Query plans regressed to full scans:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All repository queries use indexes'))
+
+    def explain(self, sql):
+        """Return (plan text, set of fully scanned tables) for a SELECT"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                details = [row[-1] for row in cursor.fetchall()]
+                scanned = set()
+                for detail in details:
+                    match = SQLITE_SCAN_RE.search(detail)
+                    if match:
+                        scanned.add(match.group(1))
+                return '\n'.join(details), scanned
+
+            cursor.execute(f'EXPLAIN {sql}')
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            scanned = {row['table'] for row in rows if row.get('type') == 'ALL' and row.get('table')}
+            plan = '\n'.join(f"{row.get('table')}: {row.get('type')} {row.get('key') or ''}" for row in rows)
+            return plan, scanned
+
+    def sample_rows(self):
+        student = User.objects.create(username='plan-check-student')
+        advertiser = User.objects.create(username='plan-check-advertiser')
+        UserProfile.objects.create(user=student, role='student')
+        UserProfile.objects.create(user=advertiser, role='advertiser')
+        category = Category.objects.create(name='Plan check category')
+        start = date.today() + timedelta(days=30)
+        offer = TravelOffer.objects.create(
+            title='Plan check offer', description='Query plan check', destination='Nowhere',
+            category=category, advertiser=advertiser, price=Decimal('100'),
+            available_spots=10, start_date=start, end_date=start + timedelta(days=3),
+            status='approved', featured=True,
+        )
+        booking = Booking.objects.create(
+            student=student, offer=offer, contact_phone='0', contact_email='plan@example.com',
+            price_paid=offer.price,
+        )
+        Message.objects.create(sender=student, recipient=advertiser, offer=offer, subject='s', body='b')
+        Favourite.objects.create(student=student, offer=offer)
+        return {
+            'student': student, 'advertiser': advertiser, 'category': category,
+            'offer': offer, 'booking': booking, 'start': start,
+        }
+
+    def calls(self, rows):
+        student, advertiser, offer = rows['student'], rows['advertiser'], rows['offer']
+        start = rows['start']
+        return [
+            ('username_taken', lambda: UserRepository.username_taken(student.username.upper())),
+            ('email_taken', lambda: UserRepository.email_taken('PLAN@example.com')),
+            ('get_all_approved_offers', lambda: TravelOfferRepository.get_all_approved_offers()[:12]),
+            ('get_featured_offers', TravelOfferRepository.get_featured_offers),
+            ('get_popular_offers', lambda: TravelOfferRepository.get_popular_offers()[:12]),
+            ('get_trending_offers', lambda: TravelOfferRepository.get_trending_offers()[:12]),
+            ('get_offers_by_category', lambda: TravelOfferRepository.get_offers_by_category(rows['category'].id)[:12]),
+            ('get_offers_by_advertiser', lambda: TravelOfferRepository.get_offers_by_advertiser(advertiser)),
+            ('get_offer_by_id', lambda: TravelOfferRepository.get_offer_by_id(offer.id)),
+            ('get_offers_by_price_range', lambda: TravelOfferRepository.get_offers_by_price_range(50, 150)[:12]),
+            ('get_offers_by_date_range', lambda: TravelOfferRepository.get_offers_by_date_range(
+                start, start + timedelta(days=10))[:12]),
+            ('get_pending_offers', TravelOfferRepository.get_pending_offers),
+            ('get_bookings_by_student', lambda: BookingRepository.get_bookings_by_student(student)),
+            ('get_bookings_by_advertiser', lambda: BookingRepository.get_bookings_by_advertiser(advertiser)),
+            ('visible_bookings (student)', lambda: visible_bookings(student, BookingRepository.get_all_bookings())),
+            ('visible_bookings (advertiser)', lambda: visible_bookings(advertiser, BookingRepository.get_all_bookings())),
+            ('get_booking_by_id', lambda: BookingRepository.get_booking_by_id(rows['booking'].id)),
+            ('get_booking_stats', BookingRepository.get_booking_stats),
+            ('get_messages_for_user', lambda: MessageRepository.get_messages_for_user(student)),
+            ('get_unread_messages_count', lambda: MessageRepository.get_unread_messages_count(advertiser)),
+            ('get_conversation', lambda: MessageRepository.get_conversation(student, advertiser, offer)),
+            ('get_user_favourites', lambda: FavouriteRepository.get_user_favourites(student)),
+            ('is_favourite', lambda: FavouriteRepository.is_favourite(student, offer)),
+            ('get_reviews_for_offer', lambda: ReviewRepository.get_reviews_for_offer(offer)),
+            ('get_offer_rating', lambda: ReviewRepository.get_offer_rating(offer)),
+            ('get_all_categories', CategoryRepository.get_all_categories),
+            ('get_categories_with_offer_count', CategoryRepository.get_categories_with_offer_count),
+        ]
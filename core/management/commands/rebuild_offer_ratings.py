@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.catalogue import bump_offer_payload_version
+from core.repositories import ReviewRepository
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the rating aggregates stored on offers (review count, '
+        'average and star histogram) from the reviews, fixing any that drifted '
+        '(for example after reviews were deleted in the admin).'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = ReviewRepository.rebuild_rating_aggregates()
+        if fixed:
+            bump_offer_payload_version()
+        self.stdout.write(self.style.SUCCESS(f'Corrected rating aggregates of {fixed:,} offers'))
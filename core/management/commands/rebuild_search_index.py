@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for travel offers'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding offer search index ({backend.name})...')
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} offers.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.images import get_image_resolver
+from core.models import TravelOffer
+from core.services import HomepageService
+
+
+class Command(BaseCommand):
+    help = 'Re-resolve the stored fallback image of every offer after DESTINATION_IMAGES changes'
+
+    def handle(self, *args, **options):
+        resolver = get_image_resolver()
+        changed = []
+        offers = TravelOffer.objects.only('id', 'destination', 'title', 'static_image')
+        for offer in offers.iterator(chunk_size=2000):
+            image = resolver.resolve(offer.destination, offer.title)
+            if image != offer.static_image:
+                offer.static_image = image
+                changed.append(offer)
+        TravelOffer.objects.bulk_update(changed, ['static_image'], batch_size=1000)
+        if changed:
+            HomepageService.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Updated {len(changed)} offers.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.popularity import decay_trending, recount_popularity, trending_half_life_hours
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the exponential time decay to offer trending scores. Run it '
+        'periodically (for example hourly). --recount also rebuilds the all-time '
+        'popularity scores from bookings, favourites and view counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life-hours', type=float, default=None,
+                            help='Override TRENDING_HALF_LIFE_HOURS')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute popularity scores from stored engagement')
+
+    def handle(self, *args, **options):
+        half_life = options['half_life_hours'] or trending_half_life_hours()
+        decayed = decay_trending(half_life_hours=half_life)
+        self.stdout.write(f'Decayed trending scores of {decayed:,} offers (half-life {half_life:g}h)')
+        if options['recount']:
+            updated = recount_popularity()
+            self.stdout.write(f'Corrected popularity scores of {updated:,} offers')
+        self.stdout.write(self.style.SUCCESS('Offer popularity refreshed'))
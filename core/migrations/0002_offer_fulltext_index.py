@@ -0,0 +1,48 @@
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+
+FTS_TABLE = 'core_traveloffer_fts'
+FULLTEXT_INDEX = 'core_traveloffer_fulltext'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                    "title, description, destination, tokenize='porter unicode61')"
+                )
+        except DatabaseError:
+            # SQLite built without FTS5; the in-memory search backend is used instead
+            return
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, destination) '
+            'SELECT id, title, description, destination FROM core_traveloffer'
+        )
+    elif connection.vendor == 'mysql':
+        schema_editor.execute(
+            f'ALTER TABLE core_traveloffer ADD FULLTEXT INDEX {FULLTEXT_INDEX} '
+            '(title, description, destination)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif connection.vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE core_traveloffer DROP INDEX {FULLTEXT_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_offer_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['student', '-booking_date'], name='booking_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['offer', '-booking_date'], name='booking_offer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status'], name='booking_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['student', '-created_at'], name='favourite_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'read'], name='message_recipient_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', '-created_at'], name='message_recipient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'created_at'], name='message_conversation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', '-created_at'], name='offer_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', 'featured', '-created_at'], name='offer_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['category', 'status', '-created_at'], name='offer_category_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', 'price'], name='offer_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', 'start_date'], name='offer_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['advertiser', '-created_at'], name='offer_advertiser_created_idx'),
+        ),
+    ]
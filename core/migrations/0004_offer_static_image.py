@@ -0,0 +1,58 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:13
+
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copy of core.images as of this migration; run refresh_offer_images
+# to apply a later table or DESTINATION_IMAGES setting
+DESTINATION_IMAGES = (
+    ('gold coast', 'images/gold-coast-sunny.jpg'),
+    ('uluru', 'images/uluru.jpg'),
+    ('byron', 'images/byron-bay.jpg'),
+    ('cairns', 'images/cairns.jpg'),
+    ('sunshine coast', 'images/sunshine-coast.jpg'),
+    ('sunshine', 'images/sunshine-coast.jpg'),
+    ('broome', 'images/broome.jpg'),
+    ('whitsunday', 'images/whitsundays.jpg'),
+    ('margaret river', 'images/margaret-river.jpg'),
+    ('margaret', 'images/margaret-river.jpg'),
+    ('great ocean road', 'images/great-ocean-road.jpg'),
+    ('kangaroo island', 'images/kangaroo-island.jpg'),
+)
+DEFAULT_IMAGE = 'images/gold-coast-sunny.jpg'
+
+
+def resolve_static_images(apps, schema_editor):
+    images = dict(DESTINATION_IMAGES)
+    pattern = re.compile('|'.join(
+        r'[\s\-_]+'.join(re.escape(word) for word in keyword.split())
+        for keyword in sorted(images, key=len, reverse=True)
+    ))
+
+    def match(text):
+        found = pattern.search(text.lower()) if text else None
+        return images[' '.join(re.split(r'[\s\-_]+', found.group(0)))] if found else None
+
+    TravelOffer = apps.get_model('core', 'TravelOffer')
+    offers = list(TravelOffer.objects.only('id', 'destination', 'title'))
+    for offer in offers:
+        offer.static_image = match(offer.destination) or match(offer.title) or DEFAULT_IMAGE
+    TravelOffer.objects.bulk_update(offers, ['static_image'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_composite_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='traveloffer',
+            name='static_image',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(resolve_static_images, migrations.RunPython.noop),
+    ]
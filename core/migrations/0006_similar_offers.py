@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_offer_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('built_at', models.DateTimeField()),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_offers', to='core.traveloffer')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.traveloffer')),
+            ],
+            options={
+                'ordering': ['offer', 'rank'],
+                'indexes': [models.Index(fields=['offer', 'rank'], name='similar_offer_rank_idx')],
+                'unique_together': {('offer', 'similar')},
+            },
+        ),
+    ]
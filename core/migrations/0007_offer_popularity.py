@@ -0,0 +1,62 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:36
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.utils.timezone
+
+
+# Weights of core.popularity as of this migration
+BOOKING_WEIGHT = 5.0
+FAVOURITE_WEIGHT = 3.0
+
+
+def seed_popularity(apps, schema_editor):
+    TravelOffer = apps.get_model('core', 'TravelOffer')
+    offers = list(TravelOffer.objects.annotate(
+        booking_total=Count('bookings', filter=~Q(bookings__status='cancelled'), distinct=True),
+        favourite_total=Count('favourited_by', distinct=True),
+    ).only('id'))
+    for offer in offers:
+        offer.popularity_score = offer.booking_total * BOOKING_WEIGHT + offer.favourite_total * FAVOURITE_WEIGHT
+        # Existing engagement has no timestamps, so it starts trending at full weight
+        offer.trending_score = offer.popularity_score
+    TravelOffer.objects.bulk_update(offers, ['popularity_score', 'trending_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_similar_offers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='traveloffer',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='trending_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', '-popularity_score', '-id'], name='offer_status_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloffer',
+            index=models.Index(fields=['status', '-trending_score', '-id'], name='offer_status_trending_idx'),
+        ),
+        migrations.RunPython(seed_popularity, migrations.RunPython.noop),
+    ]
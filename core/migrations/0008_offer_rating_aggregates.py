@@ -0,0 +1,73 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_rating_aggregates(apps, schema_editor):
+    TravelOffer = apps.get_model('core', 'TravelOffer')
+    Review = apps.get_model('core', 'Review')
+    offers = {}
+    rows = Review.objects.order_by().values_list('booking__offer_id', 'rating').annotate(count=Count('id'))
+    for offer_id, rating, count in rows:
+        offer = offers.setdefault(offer_id, TravelOffer(pk=offer_id))
+        offer.review_count += count
+        offer.rating_sum += rating * count
+        setattr(offer, f'rating_{rating}_count', getattr(offer, f'rating_{rating}_count') + count)
+    for offer in offers.values():
+        offer.avg_rating = offer.rating_sum / offer.review_count
+    TravelOffer.objects.bulk_update(offers.values(), [
+        'review_count', 'rating_sum', 'avg_rating',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_offer_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='traveloffer',
+            name='avg_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='traveloffer',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(seed_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-17 11:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_offer_from_booking(apps, schema_editor):
+    Review = apps.get_model('core', 'Review')
+    Booking = apps.get_model('core', 'Booking')
+    Review.objects.update(
+        offer_id=Subquery(Booking.objects.filter(pk=OuterRef('booking_id')).values('offer_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_offer_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='offer',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='core.traveloffer'),
+        ),
+        migrations.RunPython(copy_offer_from_booking, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='review',
+            name='offer',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='core.traveloffer'),
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['offer', '-created_at', '-id'], name='review_offer_created_idx'),
+        ),
+    ]
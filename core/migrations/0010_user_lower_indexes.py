@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-17 11:40
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+# auth.User belongs to another app, so its indexes are created through the schema editor
+USER_INDEXES = [
+    models.Index(Lower('username'), name='auth_user_username_lower_idx'),
+    models.Index(Lower('email'), name='auth_user_email_lower_idx'),
+]
+
+
+def add_user_indexes(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for index in USER_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def remove_user_indexes(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    for index in USER_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0009_review_offer'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_user_indexes, remove_user_indexes),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from PIL import Image
 import os
 
+from .images import resolve_destination_image
+
 
 class UserProfile(models.Model):
     """Extended user profile with role and additional information"""
@@ -80,6 +83,7 @@ class TravelOffer(models.Model):
     
     # Media
     image = models.ImageField(upload_to='offer_images/', blank=True, null=True)
+    static_image = models.CharField(max_length=200, blank=True, editable=False)
     
     # Status and metadata
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -87,12 +91,53 @@ class TravelOffer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Engagement, maintained with F() updates (see core/popularity.py)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    popularity_score = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+    trending_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    # Review aggregates, maintained by ReviewService.create_review
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(null=True, blank=True, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    RATING_FIELDS = (
+        'review_count', 'rating_sum', 'avg_rating',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+    COUNTER_FIELDS = ('view_count', 'popularity_score', 'trending_score', 'trending_at') + RATING_FIELDS
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Approved/pending listings, newest first
+            models.Index(fields=['status', '-created_at'], name='offer_status_created_idx'),
+            models.Index(fields=['status', 'featured', '-created_at'], name='offer_featured_idx'),
+            models.Index(fields=['category', 'status', '-created_at'], name='offer_category_status_idx'),
+            models.Index(fields=['status', 'price'], name='offer_status_price_idx'),
+            models.Index(fields=['status', 'start_date'], name='offer_status_start_idx'),
+            models.Index(fields=['advertiser', '-created_at'], name='offer_advertiser_created_idx'),
+            # "Popular" and "trending" listings
+            models.Index(fields=['status', '-popularity_score', '-id'], name='offer_status_popular_idx'),
+            models.Index(fields=['status', '-trending_score', '-id'], name='offer_status_trending_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember loaded values so signal handlers can tell which fields a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     @property
     def is_available(self):
         """Check if offer is still available for booking"""
@@ -103,6 +148,16 @@ class TravelOffer(models.Model):
             self.start_date > timezone.now().date()
         )
     
+    @property
+    def rating_histogram(self):
+        """[(stars, count, percent)] from five stars down to one"""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_{stars}_count')
+            percent = round(100 * count / self.review_count) if self.review_count else 0
+            rows.append((stars, count, percent))
+        return rows
+    
     @property
     def discount_amount(self):
         """Calculate discount amount if applicable"""
@@ -110,11 +165,26 @@ class TravelOffer(models.Model):
             return self.original_price * (self.discount_percentage / 100)
         return 0
     
+    @classmethod
+    def content_fields(cls):
+        """Fields an edit writes; counters only ever change through F() updates"""
+        return [
+            field.name for field in cls._meta.concrete_fields
+            if not field.primary_key and field.name not in cls.COUNTER_FIELDS
+        ]
+    
     def save(self, *args, **kwargs):
         # Calculate price based on discount
         if self.original_price and self.discount_percentage:
             self.price = self.original_price - self.discount_amount
         
+        # Resolve the fallback image once here rather than on every render
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'destination', 'title'} & set(update_fields):
+            self.static_image = resolve_destination_image(self.destination, self.title)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'static_image'}
+        
         super().save(*args, **kwargs)
         
         # Resize image if it exists
@@ -154,6 +224,11 @@ class Booking(models.Model):
     class Meta:
         unique_together = ('student', 'offer')
         ordering = ['-booking_date']
+        indexes = [
+            models.Index(fields=['student', '-booking_date'], name='booking_student_date_idx'),
+            models.Index(fields=['offer', '-booking_date'], name='booking_offer_date_idx'),
+            models.Index(fields=['status'], name='booking_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.offer.title}"
@@ -173,6 +248,12 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # unread_message_count runs on every page
+            models.Index(fields=['recipient', 'read'], name='message_recipient_read_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='message_recipient_created_idx'),
+            models.Index(fields=['sender', 'recipient', 'created_at'], name='message_conversation_idx'),
+        ]
     
     def __str__(self):
         return f"From {self.sender.username} to {self.recipient.username}: {self.subject}"
@@ -186,6 +267,9 @@ class Favourite(models.Model):
     
     class Meta:
         unique_together = ('student', 'offer')
+        indexes = [
+            models.Index(fields=['student', '-created_at'], name='favourite_student_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} favourited {self.offer.title}"
@@ -194,9 +278,60 @@ class Favourite(models.Model):
 class Review(models.Model):
     """Student reviews for completed bookings"""
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE)
+    # Copied from the booking so an offer's reviews page straight off one index
+    offer = models.ForeignKey(TravelOffer, on_delete=models.CASCADE, related_name='reviews', editable=False)
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['offer', '-created_at', '-id'], name='review_offer_created_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.offer_id is None:
+            self.offer_id = self.booking.offer_id
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"Review for {self.booking.offer.title} by {self.booking.student.username}"
+
+
+class OfferRecommendation(models.Model):
+    """Precomputed "students who liked this also liked" neighbours of an offer"""
+    offer = models.ForeignKey(TravelOffer, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(TravelOffer, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    built_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('offer', 'recommended')
+        ordering = ['offer', 'rank']
+        indexes = [
+            models.Index(fields=['offer', 'rank'], name='recommendation_offer_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.offer_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class SimilarOffer(models.Model):
+    """Precomputed offers whose text is most similar to an offer"""
+    offer = models.ForeignKey(TravelOffer, on_delete=models.CASCADE, related_name='similar_offers')
+    similar = models.ForeignKey(TravelOffer, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    built_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('offer', 'similar')
+        ordering = ['offer', 'rank']
+        indexes = [
+            models.Index(fields=['offer', 'rank'], name='similar_offer_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.offer_id} ~ {self.similar_id} ({self.score:.3f})"
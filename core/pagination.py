@@ -0,0 +1,253 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``COUNT(*)`` plus an ever-growing ``OFFSET``, each page is fetched
+with a ``WHERE (created_at, id) < (last_created_at, last_id)`` style filter on
+the listing order, so deep pages cost the same as the first one. Pages carry
+opaque ``next_cursor``/``previous_cursor`` tokens that stay stable while new
+offers are published.
+
+Orderings that are not made of concrete model fields (for example a
+relevance rank) fall back to offset tokens with the same interface.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q, QuerySet
+
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+
+def encode_cursor(payload):
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token, returning None for anything malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, binascii.Error):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+class KeysetPage:
+    """A single page of results plus the tokens needed to move from it"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None,
+                 number=None, total=None, total_is_exact=True):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.number = number
+        self.total = total
+        self.total_is_exact = total_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset or an in-memory offer sequence by cursor.
+
+    ``max_page_number`` keeps old ``?page=N`` links working for shallow pages;
+    numbers past it or past the last page are clamped to the last reachable page.
+    ``count_limit`` enables a bounded (approximate) total on each page.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None, max_page_number=10, count_limit=None):
+        self.per_page = per_page
+        self.max_page_number = max_page_number
+        self.count_limit = count_limit
+
+        if isinstance(object_list, QuerySet):
+            ordering = tuple(ordering or object_list.query.order_by or object_list.model._meta.ordering)
+            ordering = self._with_tiebreak(ordering, object_list.model)
+            self.keyset = all(self._is_model_field(object_list.model, field) for field in ordering)
+            object_list = object_list.order_by(*ordering)
+        else:
+            ordering = tuple(ordering or getattr(object_list, 'ordering', ()))
+            self.keyset = bool(ordering) and hasattr(object_list, 'seek')
+
+        self.object_list = object_list
+        self.ordering = ordering
+
+    @staticmethod
+    def _is_model_field(model, field):
+        try:
+            model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    @staticmethod
+    def _with_tiebreak(ordering, model):
+        names = {field.lstrip('-') for field in ordering}
+        if 'id' in names or 'pk' in names or model._meta.pk.name in names:
+            return ordering
+        descending = bool(ordering) and ordering[-1].startswith('-')
+        return ordering + ('-id' if descending else 'id',)
+
+    # -- cursors -----------------------------------------------------------
+
+    def _key_of(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _make_cursor(self, obj, direction, offset):
+        if self.keyset:
+            return encode_cursor({'d': direction, 'k': self._key_of(obj)})
+        return encode_cursor({'d': direction, 'o': offset})
+
+    def _parse_key(self, values):
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        model = getattr(self.object_list, 'model', None)
+        key = []
+        for field, value in zip(self.ordering, values):
+            if model is not None:
+                try:
+                    value = model._meta.get_field(field.lstrip('-')).to_python(value)
+                except Exception:
+                    return None
+            key.append(value)
+        return key
+
+    # -- fetching ----------------------------------------------------------
+
+    def _keyset_filter(self, key, forward):
+        """Q matching rows strictly after (forward) or before key in the ordering"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, key):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _page_after(self, key):
+        limit = self.per_page + 1
+        if isinstance(self.object_list, QuerySet):
+            rows = list(self.object_list.filter(self._keyset_filter(key, forward=True))[:limit])
+        else:
+            start = self.object_list.seek(key, after=True)
+            rows = list(self.object_list[start:start + limit])
+        has_more = len(rows) > self.per_page
+        return rows[:self.per_page], True, has_more
+
+    def _page_before(self, key):
+        limit = self.per_page + 1
+        if isinstance(self.object_list, QuerySet):
+            rows = list(
+                self.object_list.filter(self._keyset_filter(key, forward=False))
+                .order_by(*self._reversed_ordering())[:limit]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+        else:
+            stop = self.object_list.seek(key, after=False)
+            start = max(stop - self.per_page, 0)
+            rows = list(self.object_list[start:stop])
+            has_more = start > 0
+        return rows, has_more, True
+
+    def _page_at_offset(self, offset):
+        rows = list(self.object_list[offset:offset + self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        return rows[:self.per_page], offset > 0, has_more
+
+    def _last_page_number(self, offset):
+        """Number of the last non-empty page before offset"""
+        if isinstance(self.object_list, QuerySet):
+            count = self.object_list[:offset].count()
+        else:
+            count = min(len(self.object_list), offset)
+        return max((count - 1) // self.per_page + 1, 1)
+
+    def _total(self):
+        if self.count_limit is None:
+            return None, True
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list), True
+        # COUNT over at most count_limit + 1 rows keeps the cost bounded
+        count = self.object_list[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            return self.count_limit, False
+        return count, True
+
+    def page(self, cursor=None, page_number=None):
+        """Return the page addressed by a cursor token or a legacy page number"""
+        payload = decode_cursor(cursor)
+        offset = 0
+        number = None
+
+        if payload is not None and self.keyset and 'k' in payload:
+            key = self._parse_key(payload['k'])
+            if key is None:
+                payload = None
+            elif payload.get('d') == 'p':
+                rows, has_previous, has_next = self._page_before(key)
+            else:
+                rows, has_previous, has_next = self._page_after(key)
+        elif payload is not None and not self.keyset and isinstance(payload.get('o'), int):
+            offset = max(payload['o'], 0)
+            rows, has_previous, has_next = self._page_at_offset(offset)
+        else:
+            payload = None
+
+        if payload is None:
+            try:
+                number = int(page_number)
+            except (TypeError, ValueError):
+                number = 1
+            # Like Paginator.get_page, out-of-range numbers land on the nearest reachable page
+            number = min(max(number, 1), self.max_page_number)
+            offset = (number - 1) * self.per_page
+            rows, has_previous, has_next = self._page_at_offset(offset)
+            if not rows and number > 1:
+                number = self._last_page_number(offset)
+                offset = (number - 1) * self.per_page
+                rows, has_previous, has_next = self._page_at_offset(offset)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._make_cursor(rows[-1], 'n', offset + self.per_page)
+        if rows and has_previous:
+            previous_cursor = self._make_cursor(rows[0], 'p', max(offset - self.per_page, 0))
+
+        total, total_is_exact = self._total()
+        return KeysetPage(
+            rows,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+            number=number,
+            total=total,
+            total_is_exact=total_is_exact,
+        )
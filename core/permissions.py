@@ -1,6 +1,102 @@
+"""
+Role checks and object permissions.
+
+Object permissions come from ``POLICY``: for each action, the roles allowed
+to perform it and, per role, either ``ANY`` object or the relations that
+must point at the user (``'offer__advertiser'`` means the object's offer's
+advertiser). A role of ``ANY`` applies to users whose role has no entry.
+The table is compiled once into foreign-key id lookups, so an object check
+compares ids such as ``booking.offer.advertiser_id`` without loading users,
+and ``scope`` turns the same rules into a queryset filter.
+"""
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
-from .services import AuthService
+from django.db.models import Q
+
+from .models import Booking
+from .repositories import UserRepository
+
+ANY = '*'
+
+POLICY = {
+    'view_booking': {
+        'student': ('student',),
+        'advertiser': ('offer__advertiser',),
+        'moderator': ANY,
+        'admin': ANY,
+    },
+    'update_booking_status': {
+        'advertiser': ('offer__advertiser',),
+        'moderator': ANY,
+        'admin': ANY,
+    },
+    'cancel_booking': {
+        # Whoever made the booking, whatever their role
+        ANY: ('student',),
+    },
+    'edit_offer': {
+        'advertiser': ('advertiser',),
+        'moderator': ANY,
+        'admin': ANY,
+    },
+}
+
+
+def _compile(policy):
+    """{action: {role: ANY | ((lookup, attribute path), ...)}}"""
+    compiled = {}
+    for action, roles in policy.items():
+        compiled[action] = {}
+        for role, relations in roles.items():
+            if relations == ANY:
+                compiled[action][role] = ANY
+                continue
+            compiled[action][role] = tuple(
+                (f'{relation}_id', tuple(f'{relation}_id'.split('__'))) for relation in relations
+            )
+    return compiled
+
+
+_RULES = _compile(POLICY)
+
+
+def _role(user):
+    return UserRepository.get_user_profile(user).role
+
+
+def _rule(user, action):
+    if not user.is_authenticated:
+        return None
+    rules = _RULES[action]
+    return rules.get(_role(user), rules.get(ANY))
+
+
+def has_permission(user, action, obj):
+    """Whether user may perform action on obj, decided on foreign-key ids"""
+    rule = _rule(user, action)
+    if rule is None:
+        return False
+    if rule == ANY:
+        return True
+    return any(reduce(getattr, path, obj) == user.pk for lookup, path in rule)
+
+
+def scope(user, action, queryset):
+    """Narrow queryset to the objects user may perform action on"""
+    rule = _rule(user, action)
+    if rule is None:
+        return queryset.none()
+    if rule == ANY:
+        return queryset
+    return queryset.filter(reduce(or_, (Q(**{lookup: user.pk}) for lookup, path in rule)))
+
+
+def visible_bookings(user, queryset=None):
+    """Bookings user may view, filtered in SQL"""
+    return scope(user, 'view_booking', Booking.objects.all() if queryset is None else queryset)
 
 
 def role_required(allowed_roles):
@@ -14,7 +110,7 @@ def role_required(allowed_roles):
                 from django.contrib.auth.views import redirect_to_login
                 return redirect_to_login(request.get_full_path())
             
-            user_role = AuthService.get_user_role(request.user)
+            user_role = _role(request.user)
             if user_role not in allowed_roles:
                 raise PermissionDenied("You don't have permission to access this page.")
             
@@ -27,21 +123,21 @@ def is_student(user):
     """Check if user is a student"""
     if not user.is_authenticated:
         return False
-    return AuthService.get_user_role(user) == 'student'
+    return _role(user) == 'student'
 
 
 def is_advertiser(user):
     """Check if user is an advertiser"""
     if not user.is_authenticated:
         return False
-    return AuthService.get_user_role(user) == 'advertiser'
+    return _role(user) == 'advertiser'
 
 
 def is_moderator(user):
     """Check if user is a moderator or admin"""
     if not user.is_authenticated:
         return False
-    role = AuthService.get_user_role(user)
+    role = _role(user)
     return role in ['moderator', 'admin']
 
 
@@ -49,65 +145,27 @@ def is_admin(user):
     """Check if user is an admin"""
     if not user.is_authenticated:
         return False
-    return AuthService.get_user_role(user) == 'admin'
+    return _role(user) == 'admin'
 
 
 def can_edit_offer(user, offer):
     """Check if user can edit the given offer"""
-    if not user.is_authenticated:
-        return False
-    
-    user_role = AuthService.get_user_role(user)
-    
-    # Advertisers can edit their own offers
-    if user_role == 'advertiser' and offer.advertiser == user:
-        return True
-    
-    # Admins and moderators can edit any offer
-    if user_role in ['admin', 'moderator']:
-        return True
-    
-    return False
+    return has_permission(user, 'edit_offer', offer)
 
 
 def can_view_booking(user, booking):
     """Check if user can view the given booking"""
-    if not user.is_authenticated:
-        return False
-    
-    user_role = AuthService.get_user_role(user)
-    
-    # Students can view their own bookings
-    if user_role == 'student' and booking.student == user:
-        return True
-    
-    # Advertisers can view bookings for their offers
-    if user_role == 'advertiser' and booking.offer.advertiser == user:
-        return True
-    
-    # Admins and moderators can view any booking
-    if user_role in ['admin', 'moderator']:
-        return True
-    
-    return False
+    return has_permission(user, 'view_booking', booking)
 
 
 def can_update_booking_status(user, booking):
     """Check if user can update booking status"""
-    if not user.is_authenticated:
-        return False
-    
-    user_role = AuthService.get_user_role(user)
-    
-    # Advertisers can update status of bookings for their offers
-    if user_role == 'advertiser' and booking.offer.advertiser == user:
-        return True
-    
-    # Admins and moderators can update any booking status
-    if user_role in ['admin', 'moderator']:
-        return True
-    
-    return False
+    return has_permission(user, 'update_booking_status', booking)
+
+
+def can_cancel_booking(user, booking):
+    """Check if user can cancel the given booking"""
+    return has_permission(user, 'cancel_booking', booking)
 
 
 # Decorators using user_passes_test
@@ -0,0 +1,104 @@
+"""
+Denormalised popularity and trending scores for offers.
+
+Bookings, favourites and detail views add a weight to two columns on
+``TravelOffer`` with single ``UPDATE ... SET score = score + w`` statements,
+so the "popular" and "trending" listings are plain indexed reads:
+
+* ``popularity_score`` - all-time weighted engagement
+* ``trending_score`` - the same events with an exponential time decay
+
+The decay is applied in batch by ``refresh_offer_popularity``: every score is
+multiplied by ``0.5 ** (elapsed / half_life)`` since the ``trending_at`` it was
+last decayed at. Events arriving between runs count at full weight until the
+next run, which is close enough for ordering as long as the job runs well
+within one half-life. Queryset updates bypass ``save()``, so neither
+``updated_at`` nor the catalogue version move.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import TravelOffer
+
+
+VIEW_WEIGHT = 1.0
+FAVOURITE_WEIGHT = 3.0
+BOOKING_WEIGHT = 5.0
+
+# Decayed scores below this are cleared so old offers stop being rewritten
+TRENDING_FLOOR = 0.01
+
+# Listing sorts; "newest" is the default TravelOffer ordering
+NEWEST = 'newest'
+POPULAR = 'popular'
+TRENDING = 'trending'
+SORT_ORDERINGS = {
+    POPULAR: ('-popularity_score', '-id'),
+    TRENDING: ('-trending_score', '-id'),
+}
+
+
+def trending_half_life_hours():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48)
+
+
+def record_event(offer_id, weight, view=False):
+    """Add weight to an offer's popularity and trending scores"""
+    changes = {
+        'popularity_score': F('popularity_score') + weight,
+        'trending_score': F('trending_score') + weight,
+    }
+    if view:
+        changes['view_count'] = F('view_count') + 1
+    TravelOffer.objects.filter(pk=offer_id).update(**changes)
+
+
+def record_view(offer_id):
+    record_event(offer_id, VIEW_WEIGHT, view=True)
+
+
+def withdraw_event(offer_id, weight):
+    """Take back the popularity of an undone event; trending keeps its decaying share"""
+    TravelOffer.objects.filter(pk=offer_id, popularity_score__gte=weight).update(
+        popularity_score=F('popularity_score') - weight
+    )
+
+
+def decay_trending(now=None, half_life_hours=None):
+    """Decay every trending score to now; returns the number of offers rewritten"""
+    now = now or timezone.now()
+    half_life = (half_life_hours or trending_half_life_hours()) * 3600
+    decayed = 0
+    with transaction.atomic():
+        # Offers decayed together share a timestamp, so this is a handful of updates
+        stamps = (
+            TravelOffer.objects.filter(trending_score__gt=0, trending_at__lt=now)
+            .order_by().values_list('trending_at', flat=True).distinct()
+        )
+        for stamp in list(stamps):
+            factor = 0.5 ** ((now - stamp).total_seconds() / half_life)
+            decayed += TravelOffer.objects.filter(trending_score__gt=0, trending_at=stamp).update(
+                trending_score=F('trending_score') * factor, trending_at=now
+            )
+        TravelOffer.objects.filter(trending_score__gt=0, trending_score__lt=TRENDING_FLOOR).update(
+            trending_score=0
+        )
+    return decayed
+
+
+def recount_popularity():
+    """Recompute popularity from stored bookings, favourites and view counts"""
+    counted = TravelOffer.objects.annotate(
+        booking_total=Count('bookings', filter=~Q(bookings__status='cancelled'), distinct=True),
+        favourite_total=Count('favourited_by', distinct=True),
+    ).values_list('id', 'booking_total', 'favourite_total', 'view_count', 'popularity_score')
+    updated = 0
+    with transaction.atomic():
+        for offer_id, bookings, favourites, views, current in counted.iterator(chunk_size=2000):
+            score = bookings * BOOKING_WEIGHT + favourites * FAVOURITE_WEIGHT + views * VIEW_WEIGHT
+            if score != current:
+                TravelOffer.objects.filter(pk=offer_id).update(popularity_score=score)
+                updated += 1
+    return updated
@@ -0,0 +1,194 @@
+"""
+Offline item-to-item recommendations ("students who liked this also liked").
+
+Favourites and non-cancelled bookings form a sparse student x offer matrix,
+held as parallel NumPy arrays (COO style, bookings weighted above favourites).
+Offer-offer co-occurrence ``X^T X`` is accumulated student by student in
+bounded chunks of generated pairs and reduced with ``np.unique``/``bincount``,
+then normalised to cosine similarity. The top ``k`` neighbours of each offer are
+stored in ``OfferRecommendation`` and served with one indexed lookup.
+
+Incremental builds only recompute the offers touched by students whose
+favourites or bookings changed since the last build. Removed favourites leave
+no timestamp behind, so a periodic ``--full`` build is still needed to forget
+them.
+"""
+import itertools
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Booking, Favourite, OfferRecommendation, TravelOffer
+
+
+FAVOURITE_WEIGHT = 1.0
+BOOKING_WEIGHT = 2.0
+
+# Heavy users add degree^2 pairs; only their first interactions count
+MAX_ITEMS_PER_STUDENT = 200
+# Upper bound on generated pairs held in memory at once
+PAIR_CHUNK_SIZE = 5_000_000
+
+
+def _pairs_array(queryset):
+    flat = itertools.chain.from_iterable(queryset.iterator(chunk_size=20000))
+    return np.fromiter(flat, dtype=np.int64).reshape(-1, 2)
+
+
+def load_interactions():
+    """(student ids, offer ids, weights), one row per student/offer pair, sorted by student"""
+    favourites = _pairs_array(Favourite.objects.order_by().values_list('student_id', 'offer_id'))
+    bookings = _pairs_array(
+        Booking.objects.exclude(status='cancelled').order_by().values_list('student_id', 'offer_id')
+    )
+    pairs = np.concatenate([favourites, bookings])
+    weights = np.concatenate([
+        np.full(len(favourites), FAVOURITE_WEIGHT),
+        np.full(len(bookings), BOOKING_WEIGHT),
+    ])
+    if not len(pairs):
+        return pairs[:, 0], pairs[:, 1], weights
+
+    # Keep the strongest signal per student/offer pair
+    order = np.lexsort((weights, pairs[:, 1], pairs[:, 0]))
+    pairs, weights = pairs[order], weights[order]
+    last = np.r_[(pairs[1:] != pairs[:-1]).any(axis=1), True]
+    pairs, weights = pairs[last], weights[last]
+
+    # Cap each student's contribution
+    students = pairs[:, 0]
+    starts, degree = _group_bounds(students)
+    position = np.arange(len(students)) - np.repeat(starts, degree)
+    keep = position < MAX_ITEMS_PER_STUDENT
+    return students[keep], pairs[keep, 1], weights[keep]
+
+
+def _group_bounds(students):
+    starts = np.flatnonzero(np.r_[True, students[1:] != students[:-1]]) if len(students) else np.array([], dtype=np.int64)
+    return starts, np.diff(np.r_[starts, len(students)])
+
+
+def _chunk_pairs(items, weights, starts, degree, sources):
+    """Co-occurrence keys and weights for one run of whole student groups"""
+    row_degree = np.repeat(degree, degree)
+    row_start = np.repeat(starts, degree)
+    first_row = starts[0]
+    rows = np.arange(first_row, first_row + row_degree.size)
+    left = np.repeat(rows, row_degree)
+    pair_offsets = np.cumsum(row_degree) - row_degree
+    right = np.repeat(row_start, row_degree) + (np.arange(left.size) - np.repeat(pair_offsets, row_degree))
+    keep = (left != right) & sources[items[left]]
+    left, right = left[keep], right[keep]
+    return items[left] * len(sources) + items[right], weights[left] * weights[right]
+
+
+def _reduce(keys, values):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=values)
+
+
+def cooccurrence(students, items, weights, n_items, sources):
+    """Sparse X^T X restricted to rows whose offer is in sources, as (keys, values)"""
+    starts, degree = _group_bounds(students)
+    total_cost = np.cumsum(degree.astype(np.int64) ** 2)
+    parts_keys, parts_values, pending = [], [], 0
+    group = 0
+    while group < len(starts):
+        # Take as many whole students as fit in one chunk of pairs
+        done = total_cost[group - 1] if group else 0
+        end = max(group + 1, int(np.searchsorted(total_cost, done + PAIR_CHUNK_SIZE, side='right')))
+        chunk_keys, chunk_values = _reduce(*_chunk_pairs(
+            items, weights, starts[group:end], degree[group:end], sources
+        ))
+        parts_keys.append(chunk_keys)
+        parts_values.append(chunk_values)
+        pending += len(chunk_keys)
+        if pending > 4 * PAIR_CHUNK_SIZE:
+            merged = _reduce(np.concatenate(parts_keys), np.concatenate(parts_values))
+            parts_keys, parts_values, pending = [merged[0]], [merged[1]], len(merged[0])
+        group = end
+    if not parts_keys:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+    return _reduce(np.concatenate(parts_keys), np.concatenate(parts_values))
+
+
+def top_neighbours(keys, values, norms, n_items, eligible, k):
+    """(source, target, score, rank) arrays of the k best cosine neighbours per source"""
+    source, target = keys // n_items, keys % n_items
+    score = values / np.sqrt(norms[source] * norms[target])
+    keep = eligible[target]
+    source, target, score = source[keep], target[keep], score[keep]
+
+    order = np.lexsort((target, -score, source))
+    source, target, score = source[order], target[order], score[order]
+    starts, degree = _group_bounds(source)
+    rank = np.arange(len(source)) - np.repeat(starts, degree)
+    keep = rank < k
+    return source[keep], target[keep], score[keep], rank[keep]
+
+
+def last_build_time():
+    return OfferRecommendation.objects.aggregate(built=Max('built_at'))['built']
+
+
+def changed_students(since):
+    """Ids of students whose favourites or bookings changed since a time"""
+    favourites = Favourite.objects.filter(created_at__gte=since).values_list('student_id', flat=True)
+    bookings = Booking.objects.filter(updated_at__gte=since).values_list('student_id', flat=True)
+    return np.array(sorted(set(favourites) | set(bookings)), dtype=np.int64)
+
+
+def build_recommendations(k=10, full=False, log=None):
+    """Rebuild stored recommendations, incrementally unless full; returns a stats dict"""
+    built_at = timezone.now()
+    since = None if full else last_build_time()
+
+    students, offer_ids, weights = load_interactions()
+    offers, items = np.unique(offer_ids, return_inverse=True)
+    n_items = len(offers)
+    norms = np.bincount(items, weights=weights ** 2, minlength=n_items)
+    approved_ids = set(TravelOffer.objects.filter(status='approved').values_list('id', flat=True))
+    eligible = np.fromiter((offer_id in approved_ids for offer_id in offers.tolist()), dtype=bool, count=n_items)
+
+    if since is None:
+        sources = np.ones(n_items, dtype=bool)
+        rows = np.ones(len(students), dtype=bool)
+    else:
+        # Offers touched by changed students, and every student who touched those offers
+        touched_rows = np.isin(students, changed_students(since))
+        sources = np.zeros(n_items, dtype=bool)
+        sources[items[touched_rows]] = True
+        rows = np.isin(students, np.unique(students[sources[items]]))
+    if log:
+        log(f'{len(students):,} interactions, {n_items:,} offers, recomputing {int(sources.sum()):,}')
+
+    keys, values = cooccurrence(students[rows], items[rows], weights[rows], n_items, sources)
+    source, target, score, rank = top_neighbours(keys, values, norms, n_items, eligible, k)
+
+    recommendations = [
+        OfferRecommendation(
+            offer_id=offer_id, recommended_id=recommended_id,
+            score=float(value), rank=int(position), built_at=built_at,
+        )
+        for offer_id, recommended_id, value, position in zip(
+            offers[source].tolist(), offers[target].tolist(), score.tolist(), rank.tolist()
+        )
+    ]
+    with transaction.atomic():
+        if since is None:
+            OfferRecommendation.objects.all().delete()
+        else:
+            recomputed = offers[sources].tolist()
+            for start in range(0, len(recomputed), 500):
+                OfferRecommendation.objects.filter(offer_id__in=recomputed[start:start + 500]).delete()
+        OfferRecommendation.objects.bulk_create(recommendations, batch_size=5000)
+
+    return {
+        'full': since is None,
+        'interactions': len(students),
+        'offers': n_items,
+        'recomputed': int(sources.sum()),
+        'stored': len(recommendations),
+    }
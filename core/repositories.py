@@ -1,11 +1,18 @@
-from django.db.models import Q, Count, Avg
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Avg, Sum, F, FloatField, Max
+from django.db.models.functions import Cast, Lower, TruncWeek
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import (
     UserProfile, TravelOffer, Booking, Message, 
-    Favourite, Review, Category
+    Favourite, Review, Category, OfferRecommendation, SimilarOffer
 )
+from . import popularity
+from .catalogue import bump_offer_payload_version
+from .fuzzy import fuzzy_offer_matcher
+from .search import get_search_backend
 
 
 class UserRepository:
@@ -18,9 +25,32 @@ class UserRepository:
         except User.DoesNotExist:
             return None
     
+    @staticmethod
+    def username_taken(username):
+        """Case-insensitive username lookup served by the LOWER(username) index"""
+        return User.objects.alias(username_lower=Lower('username')).filter(
+            username_lower=username.strip().lower()
+        ).exists()
+    
+    @staticmethod
+    def email_taken(email):
+        """Case-insensitive email lookup served by the LOWER(email) index"""
+        return User.objects.alias(email_lower=Lower('email')).filter(email_lower=email.strip().lower()).exists()
+    
+    @staticmethod
+    def get_taken_names(after_id=0):
+        """(id, username, email) of users created after after_id"""
+        return User.objects.filter(pk__gt=after_id).order_by('pk').values_list('id', 'username', 'email')
+    
     @staticmethod
     def get_user_profile(user):
+        """The user's profile, read from the user when already loaded; created only if missing"""
+        try:
+            return user.userprofile
+        except UserProfile.DoesNotExist:
+            pass
         profile, created = UserProfile.objects.get_or_create(user=user)
+        user.userprofile = profile
         return profile
     
     @staticmethod
@@ -48,6 +78,18 @@ class TravelOfferRepository:
             featured=True
         ).select_related('advertiser', 'category')[:6]
     
+    @staticmethod
+    def get_popular_offers():
+        return TravelOfferRepository.get_all_approved_offers().order_by(
+            *popularity.SORT_ORDERINGS[popularity.POPULAR]
+        )
+    
+    @staticmethod
+    def get_trending_offers():
+        return TravelOfferRepository.get_all_approved_offers().order_by(
+            *popularity.SORT_ORDERINGS[popularity.TRENDING]
+        )
+    
     @staticmethod
     def get_offers_by_category(category_id):
         return TravelOffer.objects.filter(
@@ -66,14 +108,22 @@ class TravelOfferRepository:
         except TravelOffer.DoesNotExist:
             return None
     
+    @staticmethod
+    def get_offer_page_version(offer_id):
+        """(updated_at, review_count, latest review time) of an offer in one query, or None"""
+        return TravelOffer.objects.filter(pk=offer_id).annotate(
+            latest_review=Max('reviews__created_at')
+        ).values_list('updated_at', 'review_count', 'latest_review').first()
+    
     @staticmethod
     def search_offers(query):
-        return TravelOffer.objects.filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query) | 
-            Q(destination__icontains=query),
-            status='approved'
-        ).select_related('advertiser', 'category')
+        """Full-text search over approved offers, best matches first"""
+        return get_search_backend().search(TravelOfferRepository.get_all_approved_offers(), query)
+    
+    @staticmethod
+    def widen_search(offers, query, exact_ids):
+        """Offers matching query fuzzily, ranked below the already found exact_ids"""
+        return fuzzy_offer_matcher.search(offers, query, exact_ids=exact_ids)
     
     @staticmethod
     def get_offers_by_price_range(min_price, max_price):
@@ -91,6 +141,33 @@ class TravelOfferRepository:
             status='approved'
         ).select_related('advertiser', 'category')
     
+    @staticmethod
+    def get_offers_overlapping_dates(start_date, end_date):
+        """Approved offers whose trip shares at least one day with the window"""
+        return TravelOffer.objects.filter(
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+            status='approved'
+        ).select_related('advertiser', 'category')
+    
+    @staticmethod
+    def get_departures_by_week(offers, start_date, end_date):
+        """[(week start, count)] of offers starting in each week between two dates"""
+        counts = dict(
+            offers.filter(start_date__gte=start_date, start_date__lte=end_date)
+            .order_by()
+            .annotate(week=TruncWeek('start_date'))
+            .values('week')
+            .annotate(offers=Count('id'))
+            .values_list('week', 'offers')
+        )
+        week = start_date - timedelta(days=start_date.weekday())
+        weeks = []
+        while week <= end_date:
+            weeks.append((week, counts.get(week, 0)))
+            week += timedelta(days=7)
+        return weeks
+    
     @staticmethod
     def get_pending_offers():
         return TravelOffer.objects.filter(status='pending').select_related('advertiser', 'category')
@@ -104,7 +181,7 @@ class TravelOfferRepository:
         try:
             offer = TravelOffer.objects.get(id=offer_id)
             offer.status = status
-            offer.save()
+            offer.save(update_fields=['status', 'updated_at'])
             return offer
         except TravelOffer.DoesNotExist:
             return None
@@ -113,10 +190,19 @@ class TravelOfferRepository:
 class BookingRepository:
     """Repository for booking data operations"""
     
+    @staticmethod
+    def get_all_bookings():
+        return Booking.objects.select_related('student', 'offer', 'offer__advertiser')
+    
     @staticmethod
     def get_bookings_by_student(student):
         return Booking.objects.filter(student=student).select_related('offer', 'offer__advertiser')
     
+    @staticmethod
+    def get_bookings_by_offer_for_student(student):
+        """{offer_id: booking} for every booking a student has made"""
+        return {booking.offer_id: booking for booking in Booking.objects.filter(student=student).order_by()}
+    
     @staticmethod
     def get_bookings_by_advertiser(advertiser):
         return Booking.objects.filter(
@@ -131,48 +217,80 @@ class BookingRepository:
             return None
     
     @staticmethod
-    def create_booking(student, offer, contact_phone, contact_email, special_requests=''):
-        # Check if user already booked this offer
-        existing_booking = Booking.objects.filter(student=student, offer=offer).first()
-        if existing_booking:
-            return None, "You have already booked this offer"
-        
-        # Check availability
-        if offer.available_spots <= 0:
-            return None, "No spots available"
-        
-        # Create booking
-        booking = Booking.objects.create(
-            student=student,
-            offer=offer,
-            contact_phone=contact_phone,
-            contact_email=contact_email,
-            special_requests=special_requests,
-            price_paid=offer.price
+    def _claim_spot(offer_id):
+        """Conditionally take one spot from an offer; returns whether one was left"""
+        return TravelOffer.objects.filter(pk=offer_id, available_spots__gt=0).update(
+            available_spots=F('available_spots') - 1, updated_at=timezone.now()
+        ) == 1
+    
+    @staticmethod
+    def _release_spot(offer_id):
+        TravelOffer.objects.filter(pk=offer_id).update(
+            available_spots=F('available_spots') + 1, updated_at=timezone.now()
         )
+    
+    @staticmethod
+    def create_booking(student, offer, contact_phone, contact_email, special_requests=''):
+        # Insert first so a duplicate fails on the (student, offer) constraint, then take
+        # the spot with a conditional UPDATE: the offer row is locked only until commit
+        try:
+            with transaction.atomic():
+                booking = Booking.objects.create(
+                    student=student,
+                    offer=offer,
+                    contact_phone=contact_phone,
+                    contact_email=contact_email,
+                    special_requests=special_requests,
+                    price_paid=offer.price
+                )
+                if not BookingRepository._claim_spot(offer.pk):
+                    transaction.set_rollback(True)
+                    return None, "No spots available"
+                # Offer payloads carry the spot count; update() skips the save signals
+                transaction.on_commit(bump_offer_payload_version)
+        except IntegrityError:
+            # Only the (student, offer) constraint means a duplicate; anything else is a real error
+            if Booking.objects.filter(student=student, offer=offer).exists():
+                return None, "You have already booked this offer"
+            raise
         
-        # Decrease available spots
-        offer.available_spots -= 1
-        offer.save()
-        
+        offer.available_spots = max(offer.available_spots - 1, 0)
         return booking, None
     
     @staticmethod
     def update_booking_status(booking_id, status):
-        try:
-            booking = Booking.objects.get(id=booking_id)
-            old_status = booking.status
-            booking.status = status
-            booking.save()
-            
-            # If cancelling, return spot to offer
-            if status == 'cancelled' and old_status != 'cancelled':
-                booking.offer.available_spots += 1
-                booking.offer.save()
+        """Compare-and-set a booking's status, moving its spot in the same transaction"""
+        booking = Booking.objects.filter(id=booking_id).select_related('offer').first()
+        if booking is None:
+            return None, "Booking not found"
+        
+        old_status = booking.status
+        if old_status == status:
+            return booking, None
+        
+        with transaction.atomic():
+            # Only the request that still sees the old status moves a spot
+            changed = Booking.objects.filter(id=booking_id, status=old_status).update(
+                status=status, updated_at=timezone.now()
+            )
+            if not changed:
+                return None, "The booking was changed by someone else, please try again"
             
-            return booking
-        except Booking.DoesNotExist:
-            return None
+            if status == 'cancelled':
+                # Return the spot to the offer
+                BookingRepository._release_spot(booking.offer_id)
+                popularity.withdraw_event(booking.offer_id, popularity.BOOKING_WEIGHT)
+                transaction.on_commit(bump_offer_payload_version)
+            elif old_status == 'cancelled':
+                if not BookingRepository._claim_spot(booking.offer_id):
+                    transaction.set_rollback(True)
+                    return None, "No spots available to reinstate this booking"
+                # Cancelling withdrew the booking's popularity; count it again
+                popularity.record_event(booking.offer_id, popularity.BOOKING_WEIGHT)
+                transaction.on_commit(bump_offer_payload_version)
+        
+        booking.status = status
+        return booking, None
     
     @staticmethod
     def get_booking_stats():
@@ -240,7 +358,13 @@ class FavouriteRepository:
     
     @staticmethod
     def get_user_favourites(user):
-        return Favourite.objects.filter(student=user).select_related('offer', 'offer__advertiser')
+        return Favourite.objects.filter(student=user).select_related(
+            'offer', 'offer__advertiser'
+        ).order_by('-created_at')
+    
+    @staticmethod
+    def get_favourite_offer_ids(user):
+        return set(Favourite.objects.filter(student=user).values_list('offer_id', flat=True))
     
     @staticmethod
     def add_favourite(student, offer):
@@ -276,7 +400,8 @@ class ReviewRepository:
     
     @staticmethod
     def get_reviews_for_offer(offer):
-        return Review.objects.filter(booking__offer=offer).select_related('booking__student')
+        """An offer's reviews, newest first"""
+        return Review.objects.filter(offer=offer).select_related('booking__student').order_by('-created_at', '-id')
     
     @staticmethod
     def get_review_by_booking(booking):
@@ -292,11 +417,95 @@ class ReviewRepository:
     @staticmethod
     def get_offer_rating(offer):
         """Get average rating for an offer"""
-        result = Review.objects.filter(booking__offer=offer).aggregate(
+        result = Review.objects.filter(offer=offer).aggregate(
             avg_rating=Avg('rating'),
             total_reviews=Count('id')
         )
         return result
+    
+    @staticmethod
+    def record_rating(offer_id, rating):
+        """Fold one new review into an offer's stored rating aggregates (call inside a transaction)"""
+        star_field = f'rating_{int(rating)}_count'
+        TravelOffer.objects.filter(pk=offer_id).update(
+            review_count=F('review_count') + 1,
+            rating_sum=F('rating_sum') + rating,
+            **{star_field: F(star_field) + 1}
+        )
+        # A second statement so the average reads the incremented totals on every backend
+        TravelOffer.objects.filter(pk=offer_id).update(
+            avg_rating=Cast('rating_sum', FloatField()) / F('review_count')
+        )
+    
+    @staticmethod
+    def get_rating_aggregates():
+        """{offer_id: {field: value}} of rating aggregates recomputed from stored reviews"""
+        aggregates = {}
+        rows = Review.objects.order_by().values_list('offer_id', 'rating').annotate(count=Count('id'))
+        for offer_id, rating, count in rows:
+            values = aggregates.setdefault(offer_id, dict.fromkeys(TravelOffer.RATING_FIELDS, 0))
+            values['review_count'] += count
+            values['rating_sum'] += rating * count
+            values[f'rating_{rating}_count'] += count
+        for values in aggregates.values():
+            values['avg_rating'] = values['rating_sum'] / values['review_count']
+        return aggregates
+    
+    @staticmethod
+    def rebuild_rating_aggregates():
+        """Rewrite stored rating aggregates that disagree with the reviews; returns offers fixed"""
+        aggregates = ReviewRepository.get_rating_aggregates()
+        empty = dict.fromkeys(TravelOffer.RATING_FIELDS, 0)
+        empty['avg_rating'] = None
+        stale = []
+        for offer in TravelOffer.objects.only('id', *TravelOffer.RATING_FIELDS).iterator(chunk_size=2000):
+            expected = aggregates.get(offer.pk, empty)
+            if any(getattr(offer, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(offer, field, value)
+                stale.append(offer)
+        TravelOffer.objects.bulk_update(stale, TravelOffer.RATING_FIELDS, batch_size=1000)
+        return len(stale)
+
+
+class RecommendationRepository:
+    """Repository for precomputed offer recommendations"""
+    
+    @staticmethod
+    def get_recommended_offers(offer, limit=4):
+        """Approved offers most often liked together with an offer, best first"""
+        recommendations = OfferRecommendation.objects.filter(
+            offer=offer, recommended__status='approved'
+        ).select_related('recommended', 'recommended__category').order_by('rank')[:limit]
+        return [recommendation.recommended for recommendation in recommendations]
+    
+    @staticmethod
+    def get_recommended_offers_for_student(student, limit=6):
+        """Approved offers similar to a student's favourites and bookings that they have not picked yet"""
+        picked = set(Favourite.objects.filter(student=student).values_list('offer_id', flat=True))
+        picked.update(
+            Booking.objects.filter(student=student).exclude(status='cancelled').values_list('offer_id', flat=True)
+        )
+        if not picked:
+            return []
+        ranked = list(
+            OfferRecommendation.objects.filter(offer_id__in=picked, recommended__status='approved')
+            .exclude(recommended_id__in=picked)
+            .values('recommended_id')
+            .annotate(total=Sum('score'))
+            .order_by('-total', 'recommended_id')
+            .values_list('recommended_id', flat=True)[:limit]
+        )
+        offers = TravelOffer.objects.select_related('category').in_bulk(ranked)
+        return [offers[offer_id] for offer_id in ranked if offer_id in offers]
+    
+    @staticmethod
+    def get_similar_offers(offer, limit=4):
+        """Approved offers whose text is closest to an offer, best first"""
+        similar = SimilarOffer.objects.filter(
+            offer=offer, similar__status='approved'
+        ).select_related('similar', 'similar__category').order_by('rank')[:limit]
+        return [entry.similar for entry in similar]
 
 
 class CategoryRepository:
@@ -0,0 +1,420 @@
+"""
+Full-text search over travel offers.
+
+Three interchangeable backends sit behind ``get_search_backend()``:
+
+* ``SQLiteFTSBackend`` - an FTS5 virtual table (porter tokenizer, bm25 ranking)
+* ``MySQLFulltextBackend`` - a FULLTEXT index queried in boolean mode
+* ``InMemorySearchBackend`` - a pure-Python inverted index with BM25 scoring,
+  used when neither of the above is available
+
+Every backend takes a TravelOffer queryset and a free-text query and returns
+the queryset filtered to matching offers, annotated with ``search_rank`` and
+ordered by relevance.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import TravelOffer
+
+
+FTS_TABLE = 'core_traveloffer_fts'
+FULLTEXT_INDEX = 'core_traveloffer_fulltext'
+
+# Fields that feed the index, with the weight each one carries when ranking
+SEARCH_FIELDS = ('title', 'description', 'destination')
+FIELD_WEIGHTS = {'title': 3.0, 'description': 1.0, 'destination': 5.0}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'into', 'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+})
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, dropping stop words"""
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+_VOWELS = frozenset('aeiou')
+
+
+def _is_consonant(word, i):
+    if word[i] in _VOWELS:
+        return False
+    if word[i] == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(word):
+    """Number of vowel-consonant sequences in a word (Porter's m)"""
+    m = 0
+    previous_vowel = False
+    for i in range(len(word)):
+        consonant = _is_consonant(word, i)
+        if consonant and previous_vowel:
+            m += 1
+        previous_vowel = not consonant
+    return m
+
+
+def _has_vowel(word):
+    return any(not _is_consonant(word, i) for i in range(len(word)))
+
+
+def _ends_cvc(word):
+    return (
+        len(word) >= 3
+        and _is_consonant(word, len(word) - 3)
+        and not _is_consonant(word, len(word) - 2)
+        and _is_consonant(word, len(word) - 1)
+        and word[-1] not in 'wxy'
+    )
+
+
+def stem(token):
+    """Reduce a token to its stem using steps 1 and 5 of the Porter algorithm"""
+    if len(token) <= 2 or token.isdigit():
+        return token
+
+    # Step 1a: plurals
+    if token.endswith('sses'):
+        token = token[:-2]
+    elif token.endswith('ies'):
+        token = token[:-3] + 'y'
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        token = token[:-1]
+
+    # Step 1b: -eed, -ed, -ing
+    if token.endswith('eed'):
+        if _measure(token[:-3]) > 0:
+            token = token[:-1]
+    else:
+        for suffix in ('ing', 'ed'):
+            base = token[:-len(suffix)]
+            if token.endswith(suffix) and _has_vowel(base):
+                if base.endswith(('at', 'bl', 'iz')):
+                    token = base + 'e'
+                elif len(base) > 1 and base[-1] == base[-2] and base[-1] not in 'lsz':
+                    token = base[:-1]
+                elif _measure(base) == 1 and _ends_cvc(base):
+                    token = base + 'e'
+                else:
+                    token = base
+                break
+
+    # Step 1c: terminal y after a vowel-bearing stem
+    if token.endswith('y') and len(token) > 2 and _has_vowel(token[:-1]):
+        token = token[:-1] + 'i'
+
+    # Step 5: tidy up a trailing -e and double -ll
+    if token.endswith('e'):
+        base = token[:-1]
+        if _measure(base) > 1 or (_measure(base) == 1 and not _ends_cvc(base)):
+            token = base
+    if token.endswith('ll') and _measure(token) > 1:
+        token = token[:-1]
+    return token
+
+
+def analyze(text):
+    """Tokenize and stem text for indexing or querying"""
+    return [stem(token) for token in tokenize(text)]
+
+
+def document_terms(title, description, destination):
+    """Stemmed terms of an offer's text, counted with the per-field weights"""
+    weighted = Counter()
+    for field, text in zip(SEARCH_FIELDS, (title, description, destination)):
+        weight = FIELD_WEIGHTS[field]
+        for term in analyze(text):
+            weighted[term] += weight
+    return weighted
+
+
+class BaseSearchBackend:
+    """Common interface for offer search backends"""
+    name = None
+
+    def search(self, queryset, query):
+        """Filter queryset to offers matching query, ranked by relevance"""
+        raise NotImplementedError
+
+    def index_offer(self, offer):
+        """Add or refresh a single offer in the index"""
+
+    def remove_offer(self, offer_id):
+        """Drop a single offer from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the database and return the row count"""
+        return TravelOffer.objects.count()
+
+    @staticmethod
+    def _order(queryset):
+        return queryset.order_by('-search_rank', '-created_at', '-id')
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """FTS5 virtual table kept in sync with core_traveloffer"""
+    name = 'sqlite-fts5'
+
+    @staticmethod
+    def match_expression(query):
+        """Build an FTS5 MATCH expression; the last term matches as a prefix"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset
+        weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS)
+        offer_table = TravelOffer._meta.db_table
+        queryset = queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE} MATCH %s',
+                f'{FTS_TABLE}.rowid = {offer_table}.id',
+            ],
+            params=[expression],
+        )
+        return self._order(queryset)
+
+    def index_offer(self, offer):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [offer.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, destination) '
+                'VALUES (%s, %s, %s, %s)',
+                [offer.pk, offer.title, offer.description, offer.destination],
+            )
+
+    def remove_offer(self, offer_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [offer_id])
+
+    def rebuild(self):
+        offer_table = TravelOffer._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, destination) '
+                f'SELECT id, title, description, destination FROM {offer_table}'
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return TravelOffer.objects.count()
+
+
+class MySQLFulltextBackend(BaseSearchBackend):
+    """InnoDB FULLTEXT index over title, description and destination"""
+    name = 'mysql-fulltext'
+
+    # InnoDB ignores tokens shorter than innodb_ft_min_token_size (3 by default)
+    min_token_size = 3
+
+    def match_expression(self, query):
+        """Build a boolean-mode expression requiring every term, prefix-matched"""
+        tokens = [t for t in tokenize(query) if len(t) >= self.min_token_size]
+        if not tokens:
+            return None
+        return ' '.join(f'+{token}*' for token in tokens)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset
+        offer_table = TravelOffer._meta.db_table
+        columns = ', '.join(f'{offer_table}.{field}' for field in SEARCH_FIELDS)
+        rank = RawSQL(
+            f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)',
+            (expression,),
+            output_field=FloatField(),
+        )
+        return self._order(queryset.annotate(search_rank=rank).filter(search_rank__gt=0))
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'OPTIMIZE TABLE {TravelOffer._meta.db_table}')
+        return TravelOffer.objects.count()
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Process-local inverted index with BM25 ranking.
+
+    The index is built lazily on first use and patched by the TravelOffer
+    signals. Each worker process keeps its own copy, so this is meant for
+    development databases without FTS5 or FULLTEXT support.
+    """
+    name = 'python'
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, max_results=None):
+        self.max_results = max_results or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._terms = []
+
+    def _add(self, offer_id, weighted):
+        self._doc_terms[offer_id] = weighted
+        self._doc_lengths[offer_id] = sum(weighted.values())
+        for term, tf in weighted.items():
+            self._postings[term][offer_id] = tf
+
+    def _discard(self, offer_id):
+        for term in self._doc_terms.pop(offer_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(offer_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._doc_lengths.pop(offer_id, None)
+
+    def _ensure_built(self):
+        if not self._built:
+            self.rebuild()
+
+    def rebuild(self):
+        rows = TravelOffer.objects.values_list('id', *SEARCH_FIELDS).iterator()
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            for offer_id, title, description, destination in rows:
+                self._add(offer_id, document_terms(title, description, destination))
+            self._terms = sorted(self._postings)
+            self._built = True
+            return len(self._doc_terms)
+
+    def index_offer(self, offer):
+        with self._lock:
+            if not self._built:
+                return
+            self._discard(offer.pk)
+            self._add(offer.pk, document_terms(offer.title, offer.description, offer.destination))
+            self._terms = sorted(self._postings)
+
+    def remove_offer(self, offer_id):
+        with self._lock:
+            if not self._built:
+                return
+            self._discard(offer_id)
+            self._terms = sorted(self._postings)
+
+    def _expand_prefix(self, prefix):
+        """All indexed terms starting with prefix"""
+        start = bisect_left(self._terms, prefix)
+        matches = []
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def rank(self, query):
+        """Return [(offer_id, score)] for query, best match first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        with self._lock:
+            self._ensure_built()
+            total_docs = len(self._doc_terms) or 1
+            avg_length = (sum(self._doc_lengths.values()) / total_docs) or 1.0
+
+            # Every query term must match; the last one may match as a prefix
+            term_groups = [[stem(token)] for token in tokens[:-1]]
+            last = tokens[-1]
+            term_groups.append(sorted(set([stem(last)] + self._expand_prefix(last))))
+
+            scores = None
+            for group in term_groups:
+                group_scores = defaultdict(float)
+                for term in group:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for offer_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[offer_id] / avg_length)
+                        group_scores[offer_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                if scores is None:
+                    scores = group_scores
+                else:
+                    scores = {
+                        offer_id: score + group_scores[offer_id]
+                        for offer_id, score in scores.items()
+                        if offer_id in group_scores
+                    }
+                if not scores:
+                    return []
+
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+    def search(self, queryset, query):
+        ranked = self.rank(query)
+        if ranked is None:
+            return queryset
+        ranked = ranked[:self.max_results]
+        if not ranked:
+            return queryset.none()
+        rank = Case(
+            *[When(id=offer_id, then=Value(score)) for offer_id, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        queryset = queryset.filter(id__in=[offer_id for offer_id, _ in ranked])
+        return self._order(queryset.annotate(search_rank=rank))
+
+
+def fts5_table_exists():
+    """Check whether the FTS5 table was created by the search migration"""
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def _select_backend():
+    preferred = getattr(settings, 'OFFER_SEARCH_BACKEND', 'auto')
+    if preferred == 'python':
+        return InMemorySearchBackend()
+    if connection.vendor == 'sqlite' and fts5_table_exists():
+        return SQLiteFTSBackend()
+    if connection.vendor == 'mysql':
+        return MySQLFulltextBackend()
+    return InMemorySearchBackend()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the search backend for the default database, selecting it once"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _select_backend()
+    return _backend
@@ -0,0 +1,130 @@
+"""
+Process-local cache of text search results.
+
+Searches are keyed by their normalised filters (collapsed, lowercased query;
+prices quantised to cents; ISO dates) so "Gold Coast " with a max price of
+500 and "gold coast" with 500.00 share an entry. Each entry stores the ordered
+list of matching offer ids plus the catalogue version it was computed at; any
+offer save (approval, edit, a booking taking the last spot) bumps that
+version, so a stale entry is never served, only recomputed. Popular and
+trending orders are cached too; score changes do not bump the version, so
+those orders can lag by up to the TTL.
+
+Entries are evicted least-recently-used once ``SEARCH_CACHE_SIZE`` is reached
+and expire after ``SEARCH_CACHE_TTL`` seconds. Counters are per process.
+"""
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from .catalogue import get_catalogue_version
+
+
+CENT = Decimal('0.01')
+
+
+def _price_key(value):
+    if value in (None, ''):
+        return None
+    try:
+        return str(Decimal(value).quantize(CENT))
+    except (InvalidOperation, TypeError, ValueError):
+        return str(value)
+
+
+def search_key(query=None, category_id=None, min_price=None, max_price=None,
+               start_date=None, end_date=None, date_match='within', sort=None):
+    """Hashable, normalised key for a set of search filters"""
+    return (
+        ' '.join((query or '').lower().split()),
+        int(category_id) if category_id else None,
+        _price_key(min_price),
+        _price_key(max_price),
+        start_date.isoformat() if start_date else None,
+        end_date.isoformat() if end_date else None,
+        date_match if start_date or end_date else None,
+        sort,
+    )
+
+
+class SearchResultCache:
+    """LRU + TTL cache of ordered offer id lists, invalidated by catalogue version"""
+
+    def __init__(self, max_entries=None, ttl=None, max_ids=None):
+        self.max_entries = max_entries or getattr(settings, 'SEARCH_CACHE_SIZE', 512)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'SEARCH_CACHE_TTL', 300)
+        self.max_ids = max_ids or getattr(settings, 'SEARCH_CACHE_MAX_IDS', 1000)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def get(self, key):
+        """Cached ids for key, or None"""
+        version = get_catalogue_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires_at, ids = entry
+                if entry_version != version:
+                    self.stale += 1
+                elif expires_at <= now:
+                    self.expired += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return ids
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, ids, version):
+        """Store ids computed at catalogue version; returns False if too many to keep"""
+        if len(ids) > self.max_ids:
+            with self._lock:
+                self.uncacheable += 1
+            return False
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, tuple(ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'stale': self.stale,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'uncacheable': self.uncacheable,
+        }
+
+
+search_result_cache = SearchResultCache()
+
+
+def search_cache_enabled():
+    return getattr(settings, 'SEARCH_CACHE_ENABLED', True)
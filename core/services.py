@@ -2,14 +2,32 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .repositories import (
     UserRepository, TravelOfferRepository, BookingRepository,
     MessageRepository, FavouriteRepository, ReviewRepository,
-    CategoryRepository
+    CategoryRepository, RecommendationRepository
 )
 from .models import UserProfile, TravelOffer, Booking
+from .autocomplete import destination_autocomplete
+from .availability import EMAIL, USERNAME, taken_names
+from .catalogue import (
+    OVERLAP, WITHIN, OfferIdSequence, bump_offer_payload_version, catalogue_enabled, get_catalogue_version,
+    offer_catalogue
+)
+from .facets import facets_from_queryset
+from .fuzzy import fuzzy_search_enabled
+from .images import DEFAULT_IMAGE
+from .pagination import KeysetPaginator
+from .permissions import can_cancel_booking, can_update_booking_status, visible_bookings
+from .popularity import NEWEST, SORT_ORDERINGS, record_view
+from .search_cache import search_cache_enabled, search_key, search_result_cache
+from .sessions import session_lru
+from .throttle import login_throttle
+from .viewer import ViewerContext
 
 
 class AuthService:
@@ -21,15 +39,29 @@ class AuthService:
         user = authenticate(username=username, password=password)
         return user
     
+    @staticmethod
+    def login_with_throttle(username, password, remote_addr):
+        """Authenticate unless this IP, or this username from it, is over its login attempt budget
+
+        Returns (user, throttled); throttled attempts are refused before any
+        password hashing or user lookup.
+        """
+        if not login_throttle.acquire(remote_addr, username):
+            return None, True
+        user = AuthService.authenticate_user(username, password)
+        if user:
+            login_throttle.release(remote_addr, username)
+        return user, False
+    
     @staticmethod
     def register_user(username, email, password, role='student', **profile_data):
         """Register a new user with profile"""
         # Check if username already exists
-        if User.objects.filter(username=username).exists():
+        if UserRepository.username_taken(username):
             return None, "Username already exists"
         
         # Check if email already exists
-        if User.objects.filter(email=email).exists():
+        if UserRepository.email_taken(email):
             return None, "Email already exists"
         
         try:
@@ -44,9 +76,24 @@ class AuthService:
         except Exception as e:
             return None, str(e)
     
+    @staticmethod
+    def check_availability(username=None, email=None):
+        """{'username': bool, 'email': bool} availability of the given values for a new account"""
+        result = {}
+        if username and username.strip():
+            result['username'] = not taken_names.is_taken(USERNAME, username)
+        if email and email.strip():
+            result['email'] = not taken_names.is_taken(EMAIL, email)
+        return result
+    
+    @staticmethod
+    def get_user_profile(user):
+        """Get (or create) the user's profile"""
+        return UserRepository.get_user_profile(user)
+    
     @staticmethod
     def get_user_role(user):
-        """Get user role from profile"""
+        """Get user role from profile (free for request users loaded by ProfileBackend)"""
         profile = UserRepository.get_user_profile(user)
         return profile.role
     
@@ -75,40 +122,133 @@ class OfferService:
         return TravelOfferRepository.get_featured_offers()
     
     @staticmethod
-    def get_offer_details(offer_id, user=None):
-        """Get detailed offer information with user-specific data"""
+    def get_offer_details(offer_id, user=None, viewer=None):
+        """Get detailed offer information with user-specific data
+
+        Pass the request's ``viewer`` so favourites and bookings are read from
+        the data already loaded for this request.
+        """
         offer = TravelOfferRepository.get_offer_by_id(offer_id)
         if not offer:
             return None
         
-        # Add user-specific information
-        offer_data = {
+        viewer = viewer or ViewerContext(user)
+        return {
             'offer': offer,
-            'is_favourite': False,
-            'user_booking': None,
-            'reviews': ReviewRepository.get_reviews_for_offer(offer),
-            'rating_data': ReviewRepository.get_offer_rating(offer)
+            'is_favourite': viewer.is_favourite(offer),
+            'user_booking': viewer.booking_for(offer),
+            'reviews': ReviewService.get_reviews_page(offer),
+            'rating_data': {'avg_rating': offer.avg_rating, 'total_reviews': offer.review_count},
+            'also_liked': RecommendationRepository.get_recommended_offers(offer),
+            'similar_offers': RecommendationRepository.get_similar_offers(offer),
         }
-        
-        if user and user.is_authenticated:
-            offer_data['is_favourite'] = FavouriteRepository.is_favourite(user, offer)
-            # Check if user has booked this offer
-            user_bookings = BookingRepository.get_bookings_by_student(user)
-            for booking in user_bookings:
-                if booking.offer.id == offer.id:
-                    offer_data['user_booking'] = booking
-                    break
-        
-        return offer_data
     
     @staticmethod
-    def search_offers(query=None, category_id=None, min_price=None, max_price=None, start_date=None, end_date=None):
-        """Search offers with various filters"""
+    def search_offers(query=None, category_id=None, min_price=None, max_price=None, start_date=None, end_date=None,
+                      date_match=WITHIN, sort=NEWEST):
+        """Search offers with various filters
+
+        ``date_match`` is ``'within'`` (trip starts and ends inside the dates)
+        or ``'overlap'`` (trip shares at least one day with them). ``sort`` is
+        ``'newest'``, or ``'popular'``/``'trending'`` to order by the stored
+        engagement scores. Text searches are served from the search result
+        cache when possible.
+        """
+        ordering = SORT_ORDERINGS.get(sort)
+        if not query and not ordering and catalogue_enabled():
+            # Structured filters only: answer from the in-memory catalogue and
+            # load just the page being shown
+            return offer_catalogue.filter(
+                category_id=category_id,
+                min_price=min_price,
+                max_price=max_price,
+                start_date=start_date,
+                end_date=end_date,
+                date_match=date_match
+            )
+        
+        filters = {
+            'category_id': category_id,
+            'min_price': min_price,
+            'max_price': max_price,
+            'start_date': start_date,
+            'end_date': end_date,
+            'date_match': date_match,
+        }
+        cache_key = None
+        if query and search_cache_enabled():
+            cache_key = search_key(query=query, sort=sort if ordering else None, **filters)
+            ids = search_result_cache.get(cache_key)
+            if ids is not None:
+                return OfferIdSequence(ids)
+            # Read the version before searching so a concurrent change marks the entry stale
+            version = get_catalogue_version()
+        
         offers = TravelOfferRepository.get_all_approved_offers()
         
         if query:
             offers = TravelOfferRepository.search_offers(query)
         
+        offers = OfferService.filter_offers(offers, **filters)
+        
+        if ordering:
+            offers = offers.order_by(*ordering)
+        
+        fuzzy = query and fuzzy_search_enabled()
+        if cache_key is None and not fuzzy:
+            return offers
+        
+        # One bounded id query both fills the cache and tells whether exact
+        # matching found too few offers and typo-tolerant matching should widen them
+        ids = list(offers.values_list('id', flat=True)[:search_result_cache.max_ids + 1])
+        if fuzzy and len(ids) < getattr(settings, 'FUZZY_MIN_RESULTS', 3):
+            candidates = OfferService.filter_offers(TravelOfferRepository.get_all_approved_offers(), **filters)
+            offers = TravelOfferRepository.widen_search(candidates, query, ids)
+            if ordering:
+                offers = offers.order_by(*ordering)
+            ids = list(offers.values_list('id', flat=True)[:search_result_cache.max_ids + 1])
+        
+        if cache_key is not None:
+            search_result_cache.set(cache_key, ids, version)
+        if len(ids) > search_result_cache.max_ids:
+            return offers
+        return OfferIdSequence(ids)
+    
+    @staticmethod
+    def record_offer_view(offer, user=None):
+        """Count a detail page view (of an offer or offer id) towards its popularity, ignoring its advertiser"""
+        if user is not None and user.is_authenticated and user.pk == offer.advertiser_id:
+            return
+        record_view(getattr(offer, 'pk', offer))
+    
+    @staticmethod
+    def get_search_suggestions(prefix, limit=8):
+        """Typeahead suggestions (destinations and title words) for a search prefix"""
+        return destination_autocomplete.suggest(prefix, limit)
+    
+    @staticmethod
+    def get_search_facets(query=None, category_id=None, min_price=None, max_price=None, start_date=None, end_date=None,
+                          date_match=WITHIN):
+        """Category, price bucket and start month counts for a search"""
+        filters = {
+            'category_id': category_id,
+            'min_price': min_price,
+            'max_price': max_price,
+            'start_date': start_date,
+            'end_date': end_date,
+            'date_match': date_match,
+        }
+        if not query and catalogue_enabled():
+            return offer_catalogue.facets(**filters)
+        offers = OfferService.search_offers(query=query, **filters)
+        if isinstance(offers, OfferIdSequence):
+            offers = TravelOffer.objects.filter(id__in=list(offers.ids))
+        return facets_from_queryset(offers)
+    
+    @staticmethod
+    def filter_offers(offers, category_id=None, min_price=None, max_price=None, start_date=None, end_date=None,
+                      date_match=WITHIN):
+        """Apply the structured search filters to an offer queryset"""
         if category_id:
             offers = offers.filter(category_id=category_id)
         
@@ -118,6 +258,13 @@ class OfferService:
         if max_price is not None:
             offers = offers.filter(price__lte=max_price)
         
+        if date_match == OVERLAP:
+            if start_date:
+                offers = offers.filter(end_date__gte=start_date)
+            if end_date:
+                offers = offers.filter(start_date__lte=end_date)
+            return offers
+        
         if start_date:
             offers = offers.filter(start_date__gte=start_date)
         
@@ -126,6 +273,20 @@ class OfferService:
         
         return offers
     
+    @staticmethod
+    def get_departures_by_week(start_date, end_date, category_id=None, min_price=None, max_price=None):
+        """Approved offers departing in each week (Monday-aligned) between two dates"""
+        filters = {'category_id': category_id, 'min_price': min_price, 'max_price': max_price}
+        if catalogue_enabled():
+            weeks = offer_catalogue.departures(start_date, end_date, **filters)
+        else:
+            weeks = TravelOfferRepository.get_departures_by_week(
+                OfferService.filter_offers(TravelOfferRepository.get_all_approved_offers(), **filters),
+                start_date,
+                end_date
+            )
+        return [{'week': week.isoformat(), 'count': count} for week, count in weeks]
+    
     @staticmethod
     def create_offer(advertiser, offer_data):
         """Create a new travel offer"""
@@ -201,6 +362,11 @@ class BookingService:
         
         return booking, None
     
+    @staticmethod
+    def get_visible_bookings(user):
+        """Bookings the user may view: their own as a student, those for their offers as an advertiser"""
+        return visible_bookings(user, BookingRepository.get_all_bookings())
+    
     @staticmethod
     def get_student_bookings(student):
         """Get all bookings for a student"""
@@ -218,12 +384,14 @@ class BookingService:
         if not booking:
             return None, "Booking not found"
         
-        # Check permissions
-        user_role = AuthService.get_user_role(user)
-        if user != booking.offer.advertiser and user_role not in ['admin', 'moderator']:
+        # Whoever made a booking may cancel it
+        if not (can_update_booking_status(user, booking)
+                or status == 'cancelled' and can_cancel_booking(user, booking)):
             return None, "Insufficient permissions"
         
-        updated_booking = BookingRepository.update_booking_status(booking_id, status)
+        updated_booking, error = BookingRepository.update_booking_status(booking_id, status)
+        if error:
+            return None, error
         
         # Send notification to student
         MessageService.send_system_message(
@@ -334,7 +502,7 @@ class ReviewService:
         if not booking:
             return None, "Booking not found"
         
-        if booking.student != user:
+        if booking.student_id != user.pk:
             return None, "You can only review your own bookings"
         
         if booking.status != 'completed':
@@ -345,9 +513,20 @@ class ReviewService:
         if existing_review:
             return None, "You have already reviewed this booking"
         
-        review = ReviewRepository.create_review(booking, rating, comment)
+        with transaction.atomic():
+            review = ReviewRepository.create_review(booking, rating, comment)
+            ReviewRepository.record_rating(booking.offer_id, review.rating)
+            # Offer payloads (JSON API) carry the rating; no catalogue structure does
+            transaction.on_commit(bump_offer_payload_version)
         return review, None
     
+    @staticmethod
+    def get_reviews_page(offer, cursor=None, per_page=None):
+        """One keyset page of an offer's reviews, newest first; no cursor gives the first page"""
+        per_page = per_page or getattr(settings, 'REVIEWS_PER_PAGE', 10)
+        paginator = KeysetPaginator(ReviewRepository.get_reviews_for_offer(offer), per_page, max_page_number=1)
+        return paginator.page(cursor)
+    
     @staticmethod
     def get_offer_reviews(offer_id):
         """Get all reviews for an offer"""
@@ -372,7 +551,8 @@ class DashboardService:
             'recent_bookings': bookings[:5],
             'favourites': favourites[:5],
             'unread_messages': unread_messages,
-            'total_bookings': bookings.count() if hasattr(bookings, 'count') else len(bookings)
+            'total_bookings': bookings.count() if hasattr(bookings, 'count') else len(bookings),
+            'recommended_offers': RecommendationRepository.get_recommended_offers_for_student(student),
         }
     
     @staticmethod
@@ -400,6 +580,10 @@ class DashboardService:
             'booking_stats': booking_stats,
             'total_users': User.objects.count(),
             'total_offers': TravelOffer.objects.count(),
+            'search_cache': search_result_cache.stats(),
+            'login_throttle': login_throttle.stats(),
+            'session_cache': session_lru.stats(),
+            'availability_filter': taken_names.stats(),
         }
 
 
@@ -424,3 +608,109 @@ class CategoryService:
             return category, None
         except Exception as e:
             return None, str(e)
+
+
+class HomepageService:
+    """Service for the prebuilt, shared homepage content"""
+    
+    CACHE_KEY = 'home:content'
+    
+    # Offer fields shown on the homepage; changes to any other field leave it untouched
+    OFFER_FIELDS = (
+        'title', 'destination', 'price', 'original_price', 'end_date',
+        'image', 'status', 'featured', 'category_id',
+    )
+    
+    @staticmethod
+    def build_content():
+        """Build the featured offers and category counts as plain data"""
+        from django.templatetags.static import static
+        
+        featured = [
+            {
+                'pk': offer.pk,
+                'title': offer.title,
+                'destination': offer.destination,
+                'price': offer.price,
+                'original_price': offer.original_price,
+                'end_date': offer.end_date,
+                'static_image': static(offer.static_image or DEFAULT_IMAGE),
+            }
+            for offer in TravelOfferRepository.get_featured_offers()
+        ]
+        categories = [
+            {'id': category.id, 'name': category.name, 'offer_count': category.offer_count}
+            for category in CategoryRepository.get_categories_with_offer_count()
+        ]
+        return {'featured_offers': featured, 'categories': categories}
+    
+    @staticmethod
+    def get_content():
+        """Homepage content, built once and served from the cache until invalidated"""
+        return cache.get_or_set(
+            HomepageService.CACHE_KEY,
+            HomepageService.build_content,
+            getattr(settings, 'HOMEPAGE_CACHE_TIMEOUT', 300)
+        )
+    
+    @staticmethod
+    def invalidate():
+        cache.delete(HomepageService.CACHE_KEY)
+    
+    @staticmethod
+    def offer_changes_homepage(offer, created=False):
+        """Whether saving offer changes what the homepage shows"""
+        if created:
+            return offer.status == 'approved'
+        loaded = getattr(offer, '_loaded_values', None)
+        if loaded is None:
+            return True
+        changed = {
+            field for field in HomepageService.OFFER_FIELDS
+            if field in loaded and loaded[field] != getattr(offer, field)
+        }
+        if changed & {'status', 'featured', 'category_id'}:
+            return True
+        was_shown = loaded.get('featured') and loaded.get('status') == 'approved'
+        return bool(changed) and bool(was_shown)
+
+
+class OfferPageService:
+    """Service for the shared, cached offer detail page served to anonymous visitors"""
+    
+    CACHE_PREFIX = 'offer-page'
+    
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'OFFER_PAGE_CACHE_TIMEOUT', 300)
+    
+    @staticmethod
+    def get_version(offer_id):
+        """ETag and Last-Modified for an offer's anonymous page, or None if there is no such offer
+
+        Pages also show recommendations that are rebuilt offline, so the ETag
+        rolls over every cache timeout to bound how long those stay stale.
+        """
+        row = TravelOfferRepository.get_offer_page_version(offer_id)
+        if row is None:
+            return None
+        updated_at, review_count, latest_review = row
+        last_modified = max(updated_at, latest_review) if latest_review else updated_at
+        period = int(timezone.now().timestamp() // OfferPageService.timeout())
+        stamp = int(last_modified.timestamp() * 1_000_000)
+        return {
+            'etag': f'"{offer_id}-{stamp}-{review_count}-{period}"',
+            'last_modified': last_modified,
+        }
+    
+    @staticmethod
+    def get_page(offer_id, version):
+        return cache.get(f"{OfferPageService.CACHE_PREFIX}:{offer_id}:{version['etag']}")
+    
+    @staticmethod
+    def set_page(offer_id, version, content):
+        cache.set(
+            f"{OfferPageService.CACHE_PREFIX}:{offer_id}:{version['etag']}",
+            content,
+            OfferPageService.timeout()
+        )
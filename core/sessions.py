@@ -0,0 +1,184 @@
+"""
+Session engine with a process-local LRU in front of a shared session store.
+
+``SESSION_ENGINE = 'core.sessions'`` keeps sessions in the store named by
+``SESSION_LRU_BACKEND`` (the database by default; the file backend works as
+a local stand-in) and caches each session's serialized data in this process
+for ``SESSION_LRU_TTL`` seconds, so repeat requests on the same worker do not
+read ``django_session``. After the TTL an entry is re-read from the shared
+store, which bounds how long a logout or change made by another worker can
+go unnoticed here.
+
+Saves are coalesced: data that serializes to exactly what was loaded is not
+written again, even when the session was marked modified. Every
+``SESSION_CLEANUP_EVERY`` writes, a batch of at most ``SESSION_CLEANUP_BATCH``
+expired rows is deleted, so database-backed stores never pile up expired
+sessions between ``clearsessions`` runs. Counters are per process.
+"""
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, SessionBase
+from django.utils import timezone
+
+
+class SessionLRU:
+    """LRU + TTL map of session key -> serialized session data"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or getattr(settings, 'SESSION_LRU_SIZE', 10_000)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'SESSION_LRU_TTL', 10)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.cleaned = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, blob = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return blob
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, blob):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'writes': self.writes,
+            'coalesced_writes': self.coalesced,
+            'expired_cleaned': self.cleaned,
+        }
+
+
+session_lru = SessionLRU()
+
+
+def backend_class():
+    """SessionStore class of the shared store behind the LRU"""
+    return import_module(getattr(settings, 'SESSION_LRU_BACKEND', 'django.contrib.sessions.backends.db')).SessionStore
+
+
+class SessionStore(SessionBase):
+    """Sessions served from the process LRU when fresh, otherwise from the shared store"""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_blob = None
+
+    def _backend(self, session_key=None):
+        return backend_class()(session_key)
+
+    def _serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        key = self.session_key
+        blob = session_lru.get(key) if key else None
+        if blob is not None:
+            self._loaded_blob = blob
+            return self.serializer().loads(blob)
+
+        backend = self._backend(key)
+        data = backend.load()
+        if backend.session_key is None:
+            # Missing or expired in the shared store
+            self._session_key = None
+            return {}
+        self._loaded_blob = self._serialize(data)
+        session_lru.set(key, self._loaded_blob)
+        return data
+
+    def exists(self, session_key):
+        return session_lru.get(session_key) is not None or self._backend().exists(session_key)
+
+    def create(self):
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        blob = self._serialize(data)
+        if not must_create and blob == self._loaded_blob:
+            session_lru.coalesced += 1
+            return
+
+        backend = self._backend(self.session_key)
+        backend._session_cache = data
+        backend.save(must_create=must_create)
+        self._loaded_blob = blob
+        session_lru.set(self.session_key, blob)
+        session_lru.writes += 1
+        if session_lru.writes % getattr(settings, 'SESSION_CLEANUP_EVERY', 100) == 0:
+            clear_expired_batch()
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        session_lru.discard(session_key)
+        self._backend().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        backend_class().clear_expired()
+
+
+def clear_expired_batch(batch_size=None):
+    """Delete up to batch_size expired sessions from a database-backed store; returns the count"""
+    get_model_class = getattr(backend_class(), 'get_model_class', None)
+    if get_model_class is None:
+        return 0
+    model = get_model_class()
+    batch_size = batch_size or getattr(settings, 'SESSION_CLEANUP_BATCH', 200)
+    expired = list(
+        model.objects.filter(expire_date__lt=timezone.now()).values_list('pk', flat=True)[:batch_size]
+    )
+    if expired:
+        model.objects.filter(pk__in=expired).delete()
+        session_lru.cleaned += len(expired)
+    return len(expired)
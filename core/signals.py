@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import popularity
+from .availability import taken_names
+from .catalogue import bump_catalogue_version, offer_catalogue
+from .models import Booking, Category, Favourite, TravelOffer
+from .search import SEARCH_FIELDS, get_search_backend
+from .services import HomepageService
+
+
+@receiver(post_save, sender=TravelOffer)
+def index_saved_offer(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text index in step with offer text"""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    get_search_backend().index_offer(instance)
+
+
+@receiver(post_delete, sender=TravelOffer)
+def unindex_deleted_offer(sender, instance, **kwargs):
+    """Remove deleted offers from the full-text index"""
+    get_search_backend().remove_offer(instance.pk)
+
+
+@receiver(post_save, sender=TravelOffer)
+def refresh_catalogue_on_save(sender, instance, **kwargs):
+    """Patch the columnar offer catalogue once the save is committed"""
+    transaction.on_commit(lambda: offer_catalogue.apply_offer(instance))
+
+
+@receiver(post_delete, sender=TravelOffer)
+def refresh_catalogue_on_delete(sender, instance, **kwargs):
+    """Drop deleted offers from the columnar offer catalogue once committed"""
+    offer_id = instance.pk
+    transaction.on_commit(lambda: offer_catalogue.remove_offer(offer_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_catalogue_on_category_change(sender, **kwargs):
+    """Category names are part of the catalogue snapshot"""
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=TravelOffer)
+def refresh_homepage_on_offer_save(sender, instance, created=False, **kwargs):
+    """Rebuild the homepage when a shown offer, its status or featured flag changes"""
+    if HomepageService.offer_changes_homepage(instance, created):
+        HomepageService.invalidate()
+    instance._loaded_values = {
+        field: getattr(instance, field) for field in HomepageService.OFFER_FIELDS
+    }
+
+
+@receiver(post_delete, sender=TravelOffer)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_homepage(sender, **kwargs):
+    HomepageService.invalidate()
+
+
+@receiver(post_save, sender=Booking)
+def score_new_booking(sender, instance, created=False, **kwargs):
+    """New bookings count towards the offer's popularity and trending scores"""
+    if created and instance.status != 'cancelled':
+        popularity.record_event(instance.offer_id, popularity.BOOKING_WEIGHT)
+
+
+@receiver(post_save, sender=Favourite)
+def score_new_favourite(sender, instance, created=False, **kwargs):
+    if created:
+        popularity.record_event(instance.offer_id, popularity.FAVOURITE_WEIGHT)
+
+
+@receiver(post_delete, sender=Favourite)
+def unscore_removed_favourite(sender, instance, **kwargs):
+    popularity.withdraw_event(instance.offer_id, popularity.FAVOURITE_WEIGHT)
+
+
+@receiver(post_save, sender=User)
+def record_taken_names(sender, instance, created=False, update_fields=None, **kwargs):
+    """Keep the username/email availability filter current (logins only touch last_login)"""
+    if created or update_fields is None or {'username', 'email'} & set(update_fields):
+        taken_names.add_user(instance)
@@ -0,0 +1,64 @@
+"""
+Offline "similar offers" from the text of approved offers.
+
+Title, description and destination are analysed like the search index (same
+stemming and field weights), vectorised as TF-IDF and compared by cosine
+similarity in ``core.tfidf``. The top N neighbours of every approved offer are
+stored in ``SimilarOffer``, so the offer page reads them with one indexed
+lookup instead of processing any text per request.
+
+IDF weights move with the whole catalogue, so every build is a full rebuild.
+"""
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SimilarOffer, TravelOffer
+from .search import SEARCH_FIELDS, document_terms
+from .tfidf import TfidfMatrix, nearest_neighbours
+
+
+def load_documents():
+    """(offer ids, weighted term counts) of approved offers, in id order"""
+    rows = (
+        TravelOffer.objects.filter(status='approved')
+        .order_by('id')
+        .values_list('id', *SEARCH_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+    offer_ids, documents = [], []
+    for offer_id, title, description, destination in rows:
+        offer_ids.append(offer_id)
+        documents.append(document_terms(title, description, destination))
+    return offer_ids, documents
+
+
+def build_similar_offers(top_n=8, workers=None, log=None):
+    """Recompute stored similar offers; returns a stats dict"""
+    built_at = timezone.now()
+    workers = workers or os.cpu_count() or 1
+
+    offer_ids, documents = load_documents()
+    matrix = TfidfMatrix.from_documents(documents)
+    if log:
+        log(f'{len(offer_ids):,} offers, {matrix.n_terms:,} terms, {len(matrix.data):,} non-zero weights')
+
+    source, target, score, rank = nearest_neighbours(matrix, top_n, workers=workers)
+    similar = [
+        SimilarOffer(
+            offer_id=offer_ids[row], similar_id=offer_ids[other],
+            score=float(value), rank=int(position), built_at=built_at,
+        )
+        for row, other, value, position in zip(source.tolist(), target.tolist(), score.tolist(), rank.tolist())
+    ]
+    with transaction.atomic():
+        SimilarOffer.objects.all().delete()
+        SimilarOffer.objects.bulk_create(similar, batch_size=5000)
+
+    return {
+        'offers': len(offer_ids),
+        'terms': matrix.n_terms,
+        'stored': len(similar),
+        'workers': workers,
+    }
@@ -1,10 +1,22 @@
 from django import template
 from django.contrib.auth.models import User
-from ..services import AuthService, MessageService, FavouriteService
+from ..services import AuthService, MessageService
+from ..viewer import ViewerContext, get_viewer
 
 register = template.Library()
 
 
+def _viewer(context, user):
+    """The request's viewer context; without a request, one shared by this render"""
+    request = context.get('request')
+    if request is not None:
+        return get_viewer(request, user)
+    viewers = context.render_context.setdefault('viewers', {})
+    if user.pk not in viewers:
+        viewers[user.pk] = ViewerContext(user)
+    return viewers[user.pk]
+
+
 @register.simple_tag
 def user_role(user):
     """Get user role"""
@@ -21,11 +33,11 @@ def unread_message_count(user):
     return 0
 
 
-@register.simple_tag
-def is_favourite(user, offer):
+@register.simple_tag(takes_context=True)
+def is_favourite(context, user, offer):
     """Check if offer is in user's favourites"""
     if user.is_authenticated:
-        return FavouriteService.get_user_favourites(user).filter(offer=offer).exists()
+        return _viewer(context, user).is_favourite(offer)
     return False
 
 
@@ -66,28 +78,29 @@ def user_menu(context):
 def offer_card(context, offer, show_actions=True):
     """Render offer card with user-specific actions"""
     user = context['user']
-    is_fav = False
-    user_booking = None
-    
-    if user.is_authenticated:
-        is_fav = FavouriteService.get_user_favourites(user).filter(offer=offer).exists()
-        # Check if user has booked this offer
-        from ..repositories import BookingRepository
-        bookings = BookingRepository.get_bookings_by_student(user)
-        for booking in bookings:
-            if booking.offer.id == offer.id:
-                user_booking = booking
-                break
+    viewer = _viewer(context, user)
     
     return {
         'offer': offer,
-        'is_favourite': is_fav,
-        'user_booking': user_booking,
+        'is_favourite': viewer.is_favourite(offer),
+        'user_booking': viewer.booking_for(offer),
         'show_actions': show_actions,
         'user': user
     }
 
 
+@register.simple_tag(takes_context=True)
+def query_with(context, **params):
+    """Current query string with the given parameters replaced (empty values are removed)"""
+    query = context['request'].GET.copy()
+    for key, value in params.items():
+        if value in (None, ''):
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return f"?{query.urlencode()}" if query else '?'
+
+
 @register.filter
 def multiply(value, arg):
     """Multiply filter for template calculations"""
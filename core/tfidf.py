@@ -0,0 +1,192 @@
+"""
+Sparse TF-IDF vectors and batched cosine nearest neighbours.
+
+Documents are weighted term counts (see ``search.document_terms``). They are
+turned into L2-normalised TF-IDF rows held as CSR arrays (``indptr``,
+``indices``, ``data``), with a CSC copy acting as an inverted index. The
+neighbours of a batch of rows are found by expanding each row's terms into
+their postings and summing the products per (row, document) pair: with
+``np.unique``/``bincount`` when few postings are touched, or straight into a
+dense ``batch x documents`` block cut with ``argpartition`` when most pairs
+score anyway. Batches are cut so each expands to a bounded number of postings
+and cells. Terms found in more than ``max_df``
+of the documents are dropped: they carry almost no weight and would dominate
+the expansion cost.
+
+This module only depends on NumPy so that process pool workers can import it
+under any start method without setting up Django.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Common terms are only pruned above this many documents, so small catalogues keep them
+MIN_MAX_DF_DOCUMENTS = 50
+# Upper bound on postings expanded, and on dense score cells, per batch
+BATCH_POSTINGS = 4_000_000
+# Batches expanding to at least 1/DENSE_RATIO of their cells are scored densely
+DENSE_RATIO = 4
+
+
+class TfidfMatrix:
+    """L2-normalised TF-IDF rows in CSR form, plus the matching inverted index"""
+
+    def __init__(self, indptr, indices, data, n_terms):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_terms = n_terms
+        order = np.argsort(indices, kind='stable')
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        self.term_indptr = np.r_[0, np.cumsum(np.bincount(indices, minlength=n_terms))]
+        self.term_rows = rows[order]
+        self.term_data = data[order]
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_documents(cls, documents, max_df=0.2):
+        """Build from an iterable of {term: weighted count} mappings"""
+        vocabulary = {}
+        rows, terms, counts = [], [], []
+        n_documents = 0
+        for row, document in enumerate(documents):
+            n_documents += 1
+            for term, count in document.items():
+                rows.append(row)
+                terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+        rows = np.array(rows, dtype=np.int64)
+        terms = np.array(terms, dtype=np.int64)
+        counts = np.array(counts, dtype=np.float64)
+
+        df = np.bincount(terms, minlength=len(vocabulary))
+        keep = (df <= max(max_df * n_documents, MIN_MAX_DF_DOCUMENTS))[terms]
+        rows, terms, counts = rows[keep], terms[keep], counts[keep]
+        # Renumber the surviving terms densely
+        used, terms = np.unique(terms, return_inverse=True)
+
+        idf = np.log((1 + n_documents) / (1 + df[used])) + 1
+        values = (1 + np.log(counts)) * idf[terms]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n_documents))
+        values /= norms[rows]
+
+        # Rows arrive grouped and in order, so CSR needs no sorting
+        indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=n_documents))]
+        return cls(indptr, terms, values, len(used))
+
+    def arrays(self):
+        return self.indptr, self.indices, self.data, self.n_terms
+
+
+_matrix = None
+
+
+def _init_worker(arrays):
+    global _matrix
+    _matrix = TfidfMatrix(*arrays)
+
+
+def _neighbours_batch(task):
+    start, stop, top_n = task
+    return batch_neighbours(_matrix, start, stop, top_n)
+
+
+def _dense_top(scores, start, top_n):
+    """Top neighbours from a dense batch x documents score block"""
+    size, n = scores.shape
+    scores[np.arange(size), np.arange(start, start + size)] = 0
+    k = min(top_n, n - 1)
+    if k <= 0:
+        return _empty()
+    candidates = np.sort(np.argpartition(-scores, k - 1, axis=1)[:, :k], axis=1)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    # Best first; candidates are sorted by row number, so ties go to the lower row
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    target = np.take_along_axis(candidates, order, axis=1).ravel()
+    score = np.take_along_axis(candidate_scores, order, axis=1).ravel()
+    source = np.repeat(np.arange(start, start + size), k)
+    rank = np.tile(np.arange(k), size)
+    keep = score > 0
+    return source[keep], target[keep], score[keep], rank[keep]
+
+
+def _sparse_top(source, target, score, top_n):
+    """Top neighbours from (source, target, score) pairs"""
+    # Best first per source; ties go to the lower row
+    order = np.lexsort((target, -score, source))
+    source, target, score = source[order], target[order], score[order]
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]]) if len(source) else source
+    rank = np.arange(len(source)) - np.repeat(starts, np.diff(np.r_[starts, len(source)]))
+    keep = (rank < top_n) & (score > 0)
+    return source[keep], target[keep], score[keep], rank[keep]
+
+
+def _empty():
+    empty = np.array([], dtype=np.int64)
+    return empty, empty, np.array([], dtype=np.float64), empty
+
+
+def batch_neighbours(matrix, start, stop, top_n):
+    """(source, target, score, rank) arrays of the top_n cosine neighbours of rows [start, stop)"""
+    n = len(matrix)
+    size = stop - start
+    first, last = matrix.indptr[start], matrix.indptr[stop]
+    terms = matrix.indices[first:last]
+    weights = matrix.data[first:last]
+    local = np.repeat(np.arange(size), np.diff(matrix.indptr[start:stop + 1]))
+
+    # Expand every (row, term) entry into the term's postings
+    posting_start = matrix.term_indptr[terms]
+    lengths = matrix.term_indptr[terms + 1] - posting_start
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(posting_start - offsets, lengths) + np.arange(int(lengths.sum()))
+    sources = np.repeat(local, lengths)
+    targets = matrix.term_rows[positions]
+    products = np.repeat(weights, lengths) * matrix.term_data[positions]
+
+    if len(products) * DENSE_RATIO >= size * n:
+        # Dense enough that summing into a batch x documents block beats sorting the pairs
+        scores = np.bincount(sources * n + targets, weights=products, minlength=size * n)
+        return _dense_top(scores.reshape(size, n), start, top_n)
+
+    sources += start
+    not_self = sources != targets
+    keys, inverse = np.unique(sources[not_self] * n + targets[not_self], return_inverse=True)
+    scores = np.bincount(inverse, weights=products[not_self])
+    return _sparse_top(keys // n, keys % n, scores, top_n)
+
+
+def _batches(matrix, top_n):
+    """Split the rows into tasks expanding to about BATCH_POSTINGS postings each"""
+    df = np.diff(matrix.term_indptr)
+    cost = np.cumsum(np.bincount(
+        np.repeat(np.arange(len(matrix)), np.diff(matrix.indptr)),
+        weights=df[matrix.indices], minlength=len(matrix),
+    ))
+    tasks, start = [], 0
+    while start < len(matrix):
+        done = cost[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(cost, done + BATCH_POSTINGS, side='right')))
+        stop = min(stop, start + max(1, BATCH_POSTINGS // len(matrix)))
+        tasks.append((start, stop, top_n))
+        start = stop
+    return tasks
+
+
+def nearest_neighbours(matrix, top_n, workers=1):
+    """Top-N neighbours of every row, computed in batches across a process pool"""
+    tasks = _batches(matrix, top_n)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(matrix.arrays(),)) as executor:
+            chunksize = max(1, math.ceil(len(tasks) / (workers * 4)))
+            parts = list(executor.map(_neighbours_batch, tasks, chunksize=chunksize))
+    else:
+        parts = [batch_neighbours(matrix, *task) for task in tasks]
+    if not parts:
+        return _empty()
+    return tuple(np.concatenate(column) for column in zip(*parts))
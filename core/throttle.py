@@ -0,0 +1,248 @@
+"""
+Token-bucket throttling of login attempts.
+
+Every login attempt takes one token from two buckets, one for the client IP
+and one for the (lowercased) username tried from that IP, before
+``authenticate()`` runs. Username buckets are per IP so that failures from
+an attacker's address never lock the real owner out of their account. A
+bucket holds up to its burst size and refills continuously at its per-minute
+rate. When either bucket is empty the attempt is rejected straight away, so a
+credential-stuffing burst costs a dictionary lookup per request instead of a
+PBKDF2 hash and a user query. Successful logins hand their tokens back, so
+only failures count against a client.
+
+Buckets live in process memory by default (least recently used keys are
+dropped past ``LOGIN_THROTTLE_MAX_KEYS``). Set ``LOGIN_THROTTLE_STORE`` to a
+file path to keep them in a SQLite database shared by every worker on the
+host; each attempt is then one short ``BEGIN IMMEDIATE`` transaction.
+Counters are per process.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class Bucket:
+    """Burst size and refill rate of one kind of bucket"""
+
+    def __init__(self, prefix, burst, per_minute):
+        self.prefix = prefix
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+
+    def key(self, value):
+        return f'{self.prefix}:{value}'
+
+    def refill(self, tokens, stamp, now):
+        return min(self.burst, tokens + (now - stamp) * self.rate)
+
+
+class MemoryBucketStore:
+    """Buckets in a process-local LRU dict"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, pairs, now):
+        """Take a token from every (bucket, key) pair if all have one; returns success"""
+        with self._lock:
+            levels = []
+            for bucket, key in pairs:
+                tokens, stamp = self._buckets.get(key, (bucket.burst, now))
+                levels.append(bucket.refill(tokens, stamp, now))
+            if any(tokens < 1 for tokens in levels):
+                return False
+            for (bucket, key), tokens in zip(pairs, levels):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return True
+
+    def give_back(self, pairs, now):
+        with self._lock:
+            for bucket, key in pairs:
+                if key in self._buckets:
+                    tokens, stamp = self._buckets[key]
+                    self._buckets[key] = (min(bucket.burst, bucket.refill(tokens, stamp, now) + 1), now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by all worker processes on a host"""
+
+    # Full buckets are indistinguishable from missing ones; prune them this often
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS login_bucket '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _levels(self, connection, pairs, now):
+        keys = [key for bucket, key in pairs]
+        placeholders = ','.join('?' * len(keys))
+        rows = {
+            key: (tokens, stamp) for key, tokens, stamp in connection.execute(
+                f'SELECT key, tokens, stamp FROM login_bucket WHERE key IN ({placeholders})', keys
+            )
+        }
+        return [bucket.refill(*rows.get(key, (bucket.burst, now)), now) for bucket, key in pairs]
+
+    def take(self, pairs, now):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            levels = self._levels(connection, pairs, now)
+            allowed = all(tokens >= 1 for tokens in levels)
+            if allowed:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO login_bucket (key, tokens, stamp) VALUES (?, ?, ?)',
+                    [(key, tokens - 1, now) for (bucket, key), tokens in zip(pairs, levels)]
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(connection, pairs, now)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed
+
+    def _prune(self, connection, pairs, now):
+        # A bucket refilled to its burst can be forgotten
+        for bucket in {bucket for bucket, key in pairs}:
+            connection.execute(
+                'DELETE FROM login_bucket WHERE key LIKE ? AND tokens + (? - stamp) * ? >= ?',
+                (f'{bucket.prefix}:%', now, bucket.rate, bucket.burst)
+            )
+
+    def give_back(self, pairs, now):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            levels = self._levels(connection, pairs, now)
+            connection.executemany(
+                'UPDATE login_bucket SET tokens = ?, stamp = ? WHERE key = ?',
+                [(min(bucket.burst, tokens + 1), now, key) for (bucket, key), tokens in zip(pairs, levels)]
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM login_bucket').fetchone()[0]
+
+    def clear(self):
+        self._connect().execute('DELETE FROM login_bucket')
+
+
+class LoginThrottle:
+    """Per-IP and per-(IP, username) token buckets checked before password hashing"""
+
+    def __init__(self, enabled=None, store=None, ip_burst=None, ip_per_minute=None,
+                 username_burst=None, username_per_minute=None):
+        self.enabled = enabled if enabled is not None else getattr(settings, 'LOGIN_THROTTLE_ENABLED', True)
+        self.ip = Bucket(
+            'ip',
+            ip_burst or getattr(settings, 'LOGIN_THROTTLE_IP_BURST', 20),
+            ip_per_minute or getattr(settings, 'LOGIN_THROTTLE_IP_PER_MINUTE', 10),
+        )
+        self.username = Bucket(
+            'user',
+            username_burst or getattr(settings, 'LOGIN_THROTTLE_USERNAME_BURST', 10),
+            username_per_minute or getattr(settings, 'LOGIN_THROTTLE_USERNAME_PER_MINUTE', 2),
+        )
+        self._store = store
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def store(self):
+        if self._store is None:
+            path = getattr(settings, 'LOGIN_THROTTLE_STORE', '')
+            if path:
+                self._store = SQLiteBucketStore(path)
+            else:
+                self._store = MemoryBucketStore(getattr(settings, 'LOGIN_THROTTLE_MAX_KEYS', 50_000))
+        return self._store
+
+    def _pairs(self, remote_addr, username):
+        remote_addr = remote_addr or 'unknown'
+        pairs = [(self.ip, self.ip.key(remote_addr))]
+        if username:
+            pairs.append((self.username, self.username.key(f'{remote_addr}:{username.strip().lower()[:150]}')))
+        return pairs
+
+    def acquire(self, remote_addr, username):
+        """Spend one attempt for this IP and this username from it; False means reject without authenticating"""
+        if not self.enabled:
+            return True
+        allowed = self.store.take(self._pairs(remote_addr, username), self._now())
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+        return allowed
+
+    def release(self, remote_addr, username):
+        """Hand back the attempt of a successful login"""
+        if not self.enabled:
+            return
+        self.store.give_back(self._pairs(remote_addr, username), self._now())
+        with self._lock:
+            self.succeeded += 1
+
+    def _now(self):
+        # Monotonic time is per process; a shared store needs wall-clock stamps
+        return time.monotonic() if isinstance(self.store, MemoryBucketStore) else time.time()
+
+    def reset_stats(self):
+        self.allowed = 0
+        self.rejected = 0
+        self.succeeded = 0
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        attempts = self.allowed + self.rejected
+        return {
+            'enabled': self.enabled,
+            'store': type(self.store).__name__,
+            'buckets': len(self.store),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'succeeded': self.succeeded,
+            'rejection_rate': round(self.rejected / attempts, 3) if attempts else None,
+        }
+
+
+login_throttle = LoginThrottle()
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import auth_views, offer_views, booking_views, message_views, dashboard_views
+from .views import auth_views, offer_views, booking_views, message_views, dashboard_views, api_views
 
 urlpatterns = [
     # Home
@@ -14,9 +14,13 @@ urlpatterns = [
     # AJAX Authentication
     path('auth/ajax/login/', auth_views.ajax_login, name='ajax_login'),
     path('auth/ajax/register/', auth_views.ajax_register, name='ajax_register'),
+    path('auth/availability/', auth_views.check_availability_view, name='check_availability'),
     
     # Offers
     path('offers/', offer_views.offers_list_view, name='offers_list'),
+    path('offers/facets/', offer_views.offer_facets_view, name='offer_facets'),
+    path('offers/autocomplete/', offer_views.offer_autocomplete_view, name='offer_autocomplete'),
+    path('offers/departures/', offer_views.offer_departures_view, name='offer_departures'),
     path('offers/<int:offer_id>/', offer_views.offer_detail_view, name='offer_detail'),
     path('offers/create/', offer_views.create_offer_view, name='create_offer'),
     path('offers/<int:offer_id>/edit/', offer_views.edit_offer_view, name='edit_offer'),
@@ -50,4 +54,8 @@ urlpatterns = [
     path('dashboard/advertiser/', dashboard_views.advertiser_dashboard_view, name='advertiser_dashboard'),
     path('dashboard/moderator/', dashboard_views.moderator_dashboard_view, name='moderator_dashboard'),
     path('dashboard/admin/', dashboard_views.admin_dashboard_view, name='admin_dashboard'),
+    
+    # JSON API
+    path('api/offers/', api_views.offers_api_view, name='api_offers'),
+    path('api/offers/<int:offer_id>/reviews/', api_views.offer_reviews_api_view, name='api_offer_reviews'),
 ]
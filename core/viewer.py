@@ -0,0 +1,67 @@
+"""
+Request-scoped facts about the current viewer.
+
+Offer cards and detail pages need to know whether the user favourited or
+booked each offer. ``ViewerContext`` loads the favourite offer ids and an
+offer id -> booking map once, the first time either is needed, and every
+card or page rendered for that request reads from them. ``ViewerMiddleware``
+attaches one to each request as ``request.viewer``.
+"""
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from .repositories import BookingRepository, FavouriteRepository
+
+
+class ViewerContext:
+    """The current user's favourites and bookings, loaded at most once"""
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+
+    @cached_property
+    def favourite_ids(self):
+        if not self.is_authenticated:
+            return frozenset()
+        return frozenset(FavouriteRepository.get_favourite_offer_ids(self.user))
+
+    @cached_property
+    def bookings_by_offer(self):
+        if not self.is_authenticated:
+            return {}
+        return BookingRepository.get_bookings_by_offer_for_student(self.user)
+
+    def is_favourite(self, offer):
+        return getattr(offer, 'pk', offer) in self.favourite_ids
+
+    def booking_for(self, offer):
+        return self.bookings_by_offer.get(getattr(offer, 'pk', offer))
+
+    def forget(self, user=None):
+        """Drop loaded data after the viewer's favourites or bookings change, or they log in or out"""
+        if user is not None:
+            self.user = user
+            self.is_authenticated = user.is_authenticated
+        self.__dict__.pop('favourite_ids', None)
+        self.__dict__.pop('bookings_by_offer', None)
+
+
+def get_viewer(request=None, user=None):
+    """The request's viewer context (attached on first use), or a fresh one for a bare user"""
+    viewer = getattr(request, 'viewer', None)
+    if viewer is None:
+        viewer = ViewerContext(user if user is not None else getattr(request, 'user', None))
+        if request is not None:
+            request.viewer = viewer
+    return viewer
+
+
+class ViewerMiddleware:
+    """Attach a lazily loaded ViewerContext to every request as request.viewer"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.viewer = SimpleLazyObject(lambda: ViewerContext(request.user))
+        return self.get_response(request)
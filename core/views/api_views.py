@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.templatetags.static import static
+from django.urls import reverse
+from django.views.decorators.http import etag, require_GET
+
+from ..catalogue import get_catalogue_version, get_offer_payload_version
+from ..forms import SearchForm
+from ..images import DEFAULT_IMAGE
+from ..models import TravelOffer
+from ..pagination import KeysetPaginator
+from ..popularity import SORT_ORDERINGS
+from ..services import OfferService, ReviewService
+from .offer_views import OFFERS_COUNT_LIMIT, _search_filters
+
+API_PAGE_SIZE = 12
+API_MAX_PAGE_SIZE = 100
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        size = API_PAGE_SIZE
+    return min(max(size, 1), API_MAX_PAGE_SIZE)
+
+
+def _offers_etag(request):
+    """ETag from the catalogue and payload versions and the normalised query string, computed without a query
+
+    Score sorts get none: views, favourites and trending decay reorder them
+    without moving the catalogue version.
+    """
+    if request.GET.get('sort') in SORT_ORDERINGS:
+        return None
+    params = sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'offers-{get_catalogue_version()}.{get_offer_payload_version()}-{digest}'
+
+
+def serialize_offer(offer):
+    """Plain JSON-ready dict for an offer; built from basic types so encoding stays in C"""
+    return {
+        'id': offer.pk,
+        'title': offer.title,
+        'destination': offer.destination,
+        'category': {'id': offer.category_id, 'name': offer.category.name},
+        'price': str(offer.price),
+        'original_price': str(offer.original_price) if offer.original_price is not None else None,
+        'discount_percentage': offer.discount_percentage,
+        'available_spots': offer.available_spots,
+        'start_date': offer.start_date.isoformat(),
+        'end_date': offer.end_date.isoformat(),
+        'featured': offer.featured,
+        'rating': {'average': offer.avg_rating, 'count': offer.review_count},
+        'image': offer.image.url if offer.image else static(offer.static_image or DEFAULT_IMAGE),
+        'url': reverse('offer_detail', args=[offer.pk]),
+    }
+
+
+def serialize_review(review):
+    student = review.booking.student
+    return {
+        'id': review.pk,
+        'author': student.get_full_name() or student.username,
+        'rating': review.rating,
+        'comment': review.comment,
+        'created_at': review.created_at.isoformat(),
+    }
+
+
+def _stream_page(page):
+    """Yield the JSON body one offer at a time"""
+    yield '{"results":['
+    for index, offer in enumerate(page.object_list):
+        yield (',' if index else '') + _dumps(serialize_offer(offer))
+    yield '],' + _dumps({
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'total': page.total,
+        'total_is_exact': page.total_is_exact,
+    })[1:]
+
+
+@require_GET
+@etag(_offers_etag)
+def offers_api_view(request):
+    """Paginated JSON list of approved offers, accepting the offer search filters"""
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    offers = OfferService.search_offers(**_search_filters(form), sort=form.cleaned_data.get('sort') or 'newest')
+    paginator = KeysetPaginator(offers, _page_size(request), count_limit=OFFERS_COUNT_LIMIT)
+    page = paginator.page(request.GET.get('cursor'), request.GET.get('page'))
+
+    response = StreamingHttpResponse(_stream_page(page), content_type='application/json')
+    # Clients must revalidate, which is a cheap 304 while the catalogue is unchanged
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def offer_reviews_api_view(request, offer_id):
+    """Keyset-paginated JSON list of an offer's reviews, newest first"""
+    offer = get_object_or_404(TravelOffer.objects.only('id', 'review_count'), pk=offer_id)
+
+    page = ReviewService.get_reviews_page(offer, request.GET.get('cursor'), _page_size(request))
+    return JsonResponse({
+        'results': [serialize_review(review) for review in page],
+        'next_cursor': page.next_cursor,
+        'total': offer.review_count,
+    })
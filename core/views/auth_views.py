@@ -4,57 +4,21 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_GET, require_http_methods
 import json
 
 from ..services import AuthService
 from ..forms import CustomUserCreationForm
+from ..viewer import get_viewer
+
+TOO_MANY_ATTEMPTS = 'Too many login attempts. Please wait a minute and try again.'
 
 
 def home_view(request):
     """Homepage view with featured offers"""
-    from ..services import OfferService, CategoryService
-    from django.templatetags.static import static
+    from ..services import HomepageService
     
-    # Attach a reasonable static image per offer (fallback to a default)
-    featured = list(OfferService.get_featured_offers())
-    # simple keyword -> static image mapping
-    img_map = {
-        'gold coast': 'images/gold-coast-sunny.jpg',
-        'gold-coast': 'images/gold-coast-sunny.jpg',
-        'uluru': 'images/uluru.jpg',
-        'byron': 'images/byron-bay.jpg',
-        'byron bay': 'images/byron-bay.jpg',
-        'cairns': 'images/cairns.jpg',
-        'sunshine': 'images/sunshine-coast.jpg',
-        'broome': 'images/broome.jpg',
-        'whitsunday': 'images/whitsundays.jpg',
-        'whitsundays': 'images/whitsundays.jpg',
-        'margaret': 'images/margaret-river.jpg',
-        'uluru': 'images/uluru.jpg'
-    }
-
-    for offer in featured:
-        dest = (offer.destination or '') .lower()
-        chosen = None
-        for k, v in img_map.items():
-            if k in dest:
-                chosen = v
-                break
-        if not chosen:
-            # try title match
-            t = (offer.title or '').lower()
-            for k, v in img_map.items():
-                if k in t:
-                    chosen = v
-                    break
-        offer.static_image = static(chosen or 'images/gold-coast-sunny.jpg')
-
-    context = {
-        'featured_offers': featured,
-        'categories': CategoryService.get_categories_with_counts()
-    }
-    return render(request, 'home.html', context)
+    return render(request, 'home.html', HomepageService.get_content())
 
 
 @require_http_methods(["POST"])
@@ -71,7 +35,9 @@ def ajax_login(request):
         if not username or not password:
             return JsonResponse({'ok': False, 'error': 'Username and password are required'})
         
-        user = AuthService.authenticate_user(username, password)
+        user, throttled = AuthService.login_with_throttle(username, password, request.META.get('REMOTE_ADDR'))
+        if throttled:
+            return JsonResponse({'ok': False, 'error': TOO_MANY_ATTEMPTS}, status=429)
         if user:
             login(request, user)
             return JsonResponse({'ok': True, 'message': 'Login successful'})
@@ -82,6 +48,16 @@ def ajax_login(request):
         return JsonResponse({'ok': False, 'error': str(e)})
 
 
+@require_GET
+def check_availability_view(request):
+    """Check-as-you-type availability of a username and/or email for registration"""
+    availability = AuthService.check_availability(
+        username=request.GET.get('username'),
+        email=request.GET.get('email'),
+    )
+    return JsonResponse({field: {'available': available} for field, available in availability.items()})
+
+
 @require_http_methods(["POST"])
 def ajax_register(request):
     """AJAX registration endpoint"""
@@ -94,7 +70,7 @@ def ajax_register(request):
         form = CustomUserCreationForm(data)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            login(request, user, backend='core.backends.ProfileBackend')
             return JsonResponse({'ok': True, 'message': 'Registration successful'})
         else:
             # Get first error message
@@ -116,7 +92,10 @@ def login_view(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
         
-        user = AuthService.authenticate_user(username, password)
+        user, throttled = AuthService.login_with_throttle(username, password, request.META.get('REMOTE_ADDR'))
+        if throttled:
+            messages.error(request, TOO_MANY_ATTEMPTS)
+            return render(request, 'auth/login.html', status=429)
         if user:
             login(request, user)
             next_url = request.GET.get('next', '/')
@@ -137,7 +116,7 @@ def register_view(request):
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            login(request, user, backend='core.backends.ProfileBackend')
             messages.success(request, 'Registration successful!')
             return redirect('home')
         else:
@@ -153,6 +132,7 @@ def register_view(request):
 def logout_view(request):
     """Logout view"""
     logout(request)
+    get_viewer(request).forget(request.user)
     messages.success(request, 'You have been logged out successfully.')
     return redirect('home')
 
@@ -161,10 +141,9 @@ def logout_view(request):
 def profile_view(request):
     """User profile view"""
     from ..forms import UserProfileForm
-    from ..models import UserProfile
 
-    # Ensure the related UserProfile exists to avoid RelatedObjectDoesNotExist
-    user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
+    # The profile instance cached on request.user, so role checks see edits straight away
+    user_profile = AuthService.get_user_profile(request.user)
 
     # Keep role lookup (used by some templates) but rely on user_profile for updates
     profile_role = AuthService.get_user_role(request.user)
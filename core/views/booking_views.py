@@ -5,7 +5,9 @@ from django.http import JsonResponse
 
 from ..services import BookingService, AuthService
 from ..forms import BookingForm, BookingStatusForm
+from ..permissions import can_cancel_booking, can_view_booking
 from ..models import TravelOffer, Booking
+from ..viewer import get_viewer
 
 
 @login_required
@@ -29,6 +31,7 @@ def create_booking_view(request, offer_id):
             )
             
             if booking:
+                get_viewer(request).forget()
                 messages.success(request, 'Booking submitted successfully! You will receive a confirmation soon.')
                 return redirect('student_dashboard')
             else:
@@ -53,17 +56,13 @@ def booking_detail_view(request, booking_id):
         messages.error(request, 'Booking not found.')
         return redirect('student_dashboard')
     
-    # Check permissions
-    user_role = AuthService.get_user_role(request.user)
-    if (booking.student != request.user and 
-        booking.offer.advertiser != request.user and 
-        user_role not in ['admin', 'moderator']):
+    if not can_view_booking(request.user, booking):
         messages.error(request, 'Access denied.')
         return redirect('home')
     
     context = {
         'booking': booking,
-        'user_role': user_role
+        'user_role': AuthService.get_user_role(request.user)
     }
     return render(request, 'bookings/detail.html', context)
 
@@ -96,7 +95,7 @@ def my_bookings_view(request):
         messages.error(request, 'Access denied.')
         return redirect('home')
     
-    bookings = BookingService.get_student_bookings(request.user)
+    bookings = BookingService.get_visible_bookings(request.user)
     
     context = {
         'bookings': bookings
@@ -112,7 +111,7 @@ def received_bookings_view(request):
         messages.error(request, 'Access denied.')
         return redirect('home')
     
-    bookings = BookingService.get_advertiser_bookings(request.user)
+    bookings = BookingService.get_visible_bookings(request.user)
     
     context = {
         'bookings': bookings
@@ -130,7 +129,7 @@ def cancel_booking_view(request, booking_id):
         messages.error(request, 'Booking not found.')
         return redirect('my_bookings')
     
-    if booking.student != request.user:
+    if not can_cancel_booking(request.user, booking):
         messages.error(request, 'You can only cancel your own bookings.')
         return redirect('my_bookings')
     
@@ -146,6 +145,7 @@ def cancel_booking_view(request, booking_id):
         )
         
         if booking:
+            get_viewer(request).forget()
             messages.success(request, 'Booking cancelled successfully.')
         else:
             messages.error(request, error)
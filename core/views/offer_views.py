@@ -1,13 +1,37 @@
+import re
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.views.decorators.http import require_http_methods
 
-from ..services import OfferService, FavouriteService, CategoryService
+from ..services import OfferService, FavouriteService, CategoryService, OfferPageService
 from ..forms import TravelOfferForm, SearchForm
 from ..models import TravelOffer
+from ..pagination import KeysetPaginator
+from ..viewer import get_viewer
+
+OFFERS_PER_PAGE = 12
+# Totals above this are shown as "1000+" so counting stays cheap
+OFFERS_COUNT_LIMIT = 1000
+
+
+def _search_filters(form):
+    """Keyword arguments for OfferService searches from a valid SearchForm"""
+    category = form.cleaned_data.get('category')
+    return {
+        'query': form.cleaned_data.get('query'),
+        'category_id': category.id if category else None,
+        'min_price': form.cleaned_data.get('min_price'),
+        'max_price': form.cleaned_data.get('max_price'),
+        'start_date': form.cleaned_data.get('start_date'),
+        'end_date': form.cleaned_data.get('end_date'),
+        'date_match': form.cleaned_data.get('date_match') or 'within',
+    }
 
 
 def offers_list_view(request):
@@ -16,26 +40,11 @@ def offers_list_view(request):
     offers = OfferService.get_all_offers()
     
     if form.is_valid():
-        query = form.cleaned_data.get('query')
-        category = form.cleaned_data.get('category')
-        min_price = form.cleaned_data.get('min_price')
-        max_price = form.cleaned_data.get('max_price')
-        start_date = form.cleaned_data.get('start_date')
-        end_date = form.cleaned_data.get('end_date')
-        
-        offers = OfferService.search_offers(
-            query=query,
-            category_id=category.id if category else None,
-            min_price=min_price,
-            max_price=max_price,
-            start_date=start_date,
-            end_date=end_date
-        )
-    
-    # Pagination
-    paginator = Paginator(offers, 12)  # Show 12 offers per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        offers = OfferService.search_offers(**_search_filters(form), sort=form.cleaned_data.get('sort') or 'newest')
+    
+    # Cursor pagination; old ?page=N links still work for shallow pages
+    paginator = KeysetPaginator(offers, OFFERS_PER_PAGE, count_limit=OFFERS_COUNT_LIMIT)
+    page_obj = paginator.page(request.GET.get('cursor'), request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -45,15 +54,106 @@ def offers_list_view(request):
     return render(request, 'offers.html', context)
 
 
+def offer_facets_view(request):
+    """JSON facet counts (categories, price buckets, start months) for a search"""
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    return JsonResponse(OfferService.get_search_facets(**_search_filters(form)))
+
+
+def offer_departures_view(request):
+    """JSON count of offers departing in each week between start_date and end_date"""
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    start_date = form.cleaned_data.get('start_date')
+    end_date = form.cleaned_data.get('end_date')
+    if not start_date or not end_date or end_date < start_date:
+        return JsonResponse({'errors': {'end_date': ['Give a start_date and a later end_date.']}}, status=400)
+    if (end_date - start_date).days > 366:
+        return JsonResponse({'errors': {'end_date': ['The window can span at most a year.']}}, status=400)
+    
+    filters = _search_filters(form)
+    return JsonResponse({'weeks': OfferService.get_departures_by_week(
+        start_date,
+        end_date,
+        category_id=filters['category_id'],
+        min_price=filters['min_price'],
+        max_price=filters['max_price']
+    )})
+
+
+def offer_autocomplete_view(request):
+    """JSON typeahead suggestions for the offer search box"""
+    prefix = request.GET.get('q', '')[:100]
+    try:
+        limit = int(request.GET.get('limit', 8))
+    except ValueError:
+        limit = 8
+    
+    return JsonResponse({
+        'query': prefix,
+        'suggestions': OfferService.get_search_suggestions(prefix, limit)
+    })
+
+
 def offer_detail_view(request, offer_id):
     """Detailed view of a single offer"""
-    offer_data = OfferService.get_offer_details(offer_id, request.user)
+    if not request.user.is_authenticated and not messages.get_messages(request):
+        response = _anonymous_offer_detail(request, offer_id)
+        if response is not None:
+            return response
+    
+    offer_data = OfferService.get_offer_details(offer_id, request.user, viewer=get_viewer(request))
     if not offer_data:
         messages.error(request, 'Offer not found.')
         return redirect('offers_list')
     
+    OfferService.record_offer_view(offer_data['offer'], request.user)
+    
     context = offer_data
-    return render(request, 'offer_detail.html', context)
+    response = render(request, 'offer_detail.html', context)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+# The login and register modals carry a CSRF token, which differs per visitor
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = r'\1__csrf_token__\2'
+
+
+def _anonymous_offer_detail(request, offer_id):
+    """Offer page shared by all anonymous visitors, revalidated with ETag/Last-Modified
+
+    Returns None when the offer does not exist so the caller handles it.
+    """
+    version = OfferPageService.get_version(offer_id)
+    if version is None:
+        return None
+    
+    last_modified = int(version['last_modified'].timestamp())
+    response = get_conditional_response(request, etag=version['etag'], last_modified=last_modified)
+    if response is None:
+        # Revalidations are not new views, and skipping them keeps a 304 free of writes
+        OfferService.record_offer_view(offer_id, request.user)
+        content = OfferPageService.get_page(offer_id, version)
+        if content is None:
+            offer_data = OfferService.get_offer_details(offer_id, request.user, viewer=get_viewer(request))
+            if not offer_data:
+                return None
+            rendered = render(request, 'offer_detail.html', offer_data)
+            content = CSRF_INPUT.sub(CSRF_PLACEHOLDER, rendered.content.decode())
+            OfferPageService.set_page(offer_id, version, content)
+        response = HttpResponse(content.replace('__csrf_token__', get_token(request)))
+    
+    response['ETag'] = version['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
 
 
 @login_required
@@ -68,6 +168,7 @@ def toggle_favourite_view(request, offer_id):
     if error:
         return JsonResponse({'error': error}, status=400)
     
+    get_viewer(request).forget()
     return JsonResponse({
         'is_favourite': is_favourite,
         'message': 'Added to favourites' if is_favourite else 'Removed from favourites'
@@ -107,19 +208,20 @@ def edit_offer_view(request, offer_id):
     
     offer = get_object_or_404(TravelOffer, id=offer_id)
     
-    # Check permissions
-    if offer.advertiser != request.user:
+    # Only the owner edits here; the form flow returns to the advertiser dashboard
+    if offer.advertiser_id != request.user.pk:
         messages.error(request, 'You can only edit your own offers.')
         return redirect('advertiser_dashboard')
     
     if request.method == 'POST':
         form = TravelOfferForm(request.POST, request.FILES, instance=offer)
         if form.is_valid():
-            updated_offer = form.save()
+            updated_offer = form.save(commit=False)
             # Reset status to pending if offer was rejected
             if updated_offer.status == 'rejected':
                 updated_offer.status = 'pending'
-                updated_offer.save()
+            # Leave the counters to their F() updates
+            updated_offer.save(update_fields=TravelOffer.content_fields())
             messages.success(request, 'Offer updated successfully!')
             return redirect('advertiser_dashboard')
     else:
@@ -152,17 +254,16 @@ def offers_by_category_view(request, category_id):
     """List offers by category"""
     from ..repositories import CategoryRepository, TravelOfferRepository
     
-    category = get_object_or_404(CategoryRepository.get_category_by_id(category_id))
+    category = CategoryRepository.get_category_by_id(category_id)
     if not category:
         messages.error(request, 'Category not found.')
         return redirect('offers_list')
     
     offers = TravelOfferRepository.get_offers_by_category(category_id)
     
-    # Pagination
-    paginator = Paginator(offers, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Cursor pagination; old ?page=N links still work for shallow pages
+    paginator = KeysetPaginator(offers, OFFERS_PER_PAGE, count_limit=OFFERS_COUNT_LIMIT)
+    page_obj = paginator.page(request.GET.get('cursor'), request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
@@ -0,0 +1,40 @@
+// Check-as-you-type username/email availability for inputs marked data-availability
+(function(){
+  const url = document.currentScript.dataset.url;
+  const DELAY = 300;
+
+  function hintFor(input){
+    let hint = input.parentNode.querySelector('.availability-hint');
+    if (!hint) {
+      hint = document.createElement('small');
+      hint.className = 'availability-hint';
+      input.insertAdjacentElement('afterend', hint);
+    }
+    return hint;
+  }
+
+  function watch(input){
+    const field = input.dataset.availability;
+    let timer = null;
+    let latest = 0;
+    input.addEventListener('input', ()=>{
+      clearTimeout(timer);
+      const value = input.value.trim();
+      const hint = hintFor(input);
+      if (!value || (field === 'email' && !input.checkValidity())) { hint.textContent = ''; return; }
+      timer = setTimeout(async ()=>{
+        const request = ++latest;
+        const resp = await fetch(`${url}?${field}=${encodeURIComponent(value)}`, {credentials: 'same-origin'});
+        if (!resp.ok || request !== latest) return;
+        const result = (await resp.json())[field];
+        if (!result) return;
+        hint.textContent = result.available ? `This ${field} is available` : `This ${field} is already taken`;
+        hint.style.color = result.available ? '#28a745' : '#dc3545';
+      }, DELAY);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', ()=>{
+    document.querySelectorAll('input[data-availability]').forEach(watch);
+  });
+})();
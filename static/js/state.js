@@ -4,18 +4,26 @@ window.ST = (function(){
   const AUTH_KEY  = "st_auth_mpa_v3_5_1";
   const SEED = window.EMBED_SEED || {};
 
+  // A fresh copy: change it freely, then pass it to saveState
   function getState(){
     const raw = localStorage.getItem(STATE_KEY);
     if (raw) { try { return JSON.parse(raw); } catch(e){} }
     localStorage.setItem(STATE_KEY, JSON.stringify(SEED));
     return JSON.parse(localStorage.getItem(STATE_KEY));
   }
+  // Shared parsed state for lookups, reused until the stored string changes (e.g. from another tab); never mutate it
+  let cachedRaw = null, cachedState = null;
+  function readState(){
+    const raw = localStorage.getItem(STATE_KEY);
+    if (raw === null || raw !== cachedRaw) { cachedState = getState(); cachedRaw = localStorage.getItem(STATE_KEY); }
+    return cachedState;
+  }
   function saveState(s){ localStorage.setItem(STATE_KEY, JSON.stringify(s)); }
   function setAuth(id){ id ? localStorage.setItem(AUTH_KEY, id) : localStorage.removeItem(AUTH_KEY); }
   function getAuth(){
     const id = localStorage.getItem(AUTH_KEY);
     if(!id) return null;
-    return getState().users.find(u=>u.id===id) || null;
+    return readState().users.find(u=>u.id===id) || null;
   }
   function logout(){ setAuth(null); }
 
@@ -28,5 +36,5 @@ window.ST = (function(){
     }
     return me;
   }
-  return { getState, saveState, setAuth, getAuth, logout, ensureLoggedIn };
+  return { getState, readState, saveState, setAuth, getAuth, logout, ensureLoggedIn };
 })();
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -33,10 +34,18 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.viewer.ViewerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Session users are loaded together with their profile, so role checks need no queries;
+# ModelBackend keeps sessions created before the switch working until they expire
+AUTHENTICATION_BACKENDS = [
+    'core.backends.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 ROOT_URLCONF = 'student_travels.urls'
 
 TEMPLATES = [
@@ -141,5 +150,73 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Session settings
+SESSION_ENGINE = 'core.sessions'
 SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# Caching
+# The default per-process cache is fine for development. Set CACHE_BACKEND=file
+# so worker processes on the same host share cached data such as the offer
+# catalogue version.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'student_travels_cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'student-travels',
+        }
+    }
+
+# Offer catalogue (in-memory columnar snapshot used for offer list filters)
+OFFER_CATALOGUE_ENABLED = os.getenv('OFFER_CATALOGUE_ENABLED', 'True').lower() == 'true'
+OFFER_CATALOGUE_MAX_AGE = int(os.getenv('OFFER_CATALOGUE_MAX_AGE', '60'))  # seconds
+
+# Typo-tolerant search: trigram matching kicks in when exact search finds fewer than FUZZY_MIN_RESULTS offers
+FUZZY_SEARCH_ENABLED = os.getenv('FUZZY_SEARCH_ENABLED', 'True').lower() == 'true'
+FUZZY_MIN_RESULTS = int(os.getenv('FUZZY_MIN_RESULTS', '3'))
+FUZZY_SIMILARITY_THRESHOLD = float(os.getenv('FUZZY_SIMILARITY_THRESHOLD', '0.3'))
+
+# Prebuilt homepage content; invalidated by offer/category signals, this only bounds staleness across workers
+HOMEPAGE_CACHE_TIMEOUT = int(os.getenv('HOMEPAGE_CACHE_TIMEOUT', '300'))  # seconds
+
+# Per-process LRU cache of text search results, invalidated by the offer catalogue version
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', 'True').lower() == 'true'
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '512'))  # entries
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))  # seconds
+
+# Trending scores halve every TRENDING_HALF_LIFE_HOURS; run refresh_offer_popularity well within that
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '48'))
+
+# Anonymous offer detail pages are cached and revalidated by ETag; recommendations on them may lag this long
+OFFER_PAGE_CACHE_TIMEOUT = int(os.getenv('OFFER_PAGE_CACHE_TIMEOUT', '300'))  # seconds
+
+# Reviews embedded in an offer page; the rest load from the reviews API a page at a time
+REVIEWS_PER_PAGE = int(os.getenv('REVIEWS_PER_PAGE', '10'))
+
+# Login attempts per client IP and per username from each IP (token buckets checked before password hashing)
+LOGIN_THROTTLE_ENABLED = os.getenv('LOGIN_THROTTLE_ENABLED', 'True').lower() == 'true'
+LOGIN_THROTTLE_IP_BURST = int(os.getenv('LOGIN_THROTTLE_IP_BURST', '20'))
+LOGIN_THROTTLE_IP_PER_MINUTE = float(os.getenv('LOGIN_THROTTLE_IP_PER_MINUTE', '10'))
+LOGIN_THROTTLE_USERNAME_BURST = int(os.getenv('LOGIN_THROTTLE_USERNAME_BURST', '10'))
+LOGIN_THROTTLE_USERNAME_PER_MINUTE = float(os.getenv('LOGIN_THROTTLE_USERNAME_PER_MINUTE', '2'))
+# Path of a SQLite file to share buckets between worker processes; empty keeps them per process
+LOGIN_THROTTLE_STORE = os.getenv('LOGIN_THROTTLE_STORE', '')
+
+# Sessions are cached per process in front of SESSION_LRU_BACKEND (the database, or e.g. the file backend)
+SESSION_LRU_BACKEND = os.getenv('SESSION_LRU_BACKEND', 'django.contrib.sessions.backends.db')
+SESSION_LRU_SIZE = int(os.getenv('SESSION_LRU_SIZE', '10000'))  # sessions
+SESSION_LRU_TTL = int(os.getenv('SESSION_LRU_TTL', '10'))  # seconds before re-reading the shared store
+SESSION_CLEANUP_EVERY = int(os.getenv('SESSION_CLEANUP_EVERY', '100'))  # session writes
+SESSION_CLEANUP_BATCH = int(os.getenv('SESSION_CLEANUP_BATCH', '200'))  # expired sessions per cleanup
+
+# Bloom filter of taken usernames/emails behind the register form's availability checks
+AVAILABILITY_FILTER_MAX_AGE = int(os.getenv('AVAILABILITY_FILTER_MAX_AGE', '3600'))  # seconds between full rebuilds
+AVAILABILITY_FILTER_ERROR_RATE = float(os.getenv('AVAILABILITY_FILTER_ERROR_RATE', '0.01'))